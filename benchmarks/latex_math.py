@@ -0,0 +1,63 @@
+"""Compares the direct translation of formulas to OMML with the conversion through MathML.
+
+Run from the repository root: python benchmarks/latex_math.py [file.md ...]"""
+import os
+import sys
+import timeit
+
+import docx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from md2gost.latex_math import _translate, _convert_mathml, _Unsupported  # noqa: E402
+from md2gost.parser.markdown_parser import MarkdownParser  # noqa: E402
+
+EXAMPLE_PATH = os.path.join(os.path.dirname(__file__), "..", "examples", "example.md")
+
+
+def synthetic_formulas() -> list[str]:
+    formulas = []
+    for i in range(100):
+        formulas += [
+            rf"x_{{{i}}}^2 + y_{{{i}}}^2 = r^2",
+            rf"\frac{{a_{i} + b}}{{c - {i}}}",
+            rf"\sum_{{k=1}}^{{{i}}} \frac{{1}}{{k^2}}",
+            rf"\sqrt[3]{{\alpha_{i} + \beta}} \cdot \sin^2 \theta",
+            rf"\int_0^{{{i}}} e^{{-\lambda t}} dt \le \infty",
+        ]
+    return formulas
+
+
+def measure(name: str, formulas: list[str]):
+    direct = []
+    for formula in formulas:
+        try:
+            _translate(formula)
+            direct.append(formula)
+        except _Unsupported:
+            pass
+    if not direct:
+        print(f"{name}: нет формул для прямого преобразования")
+        return
+
+    number = max(1, 2000 // len(direct))
+    direct_time = min(timeit.repeat(lambda: [_translate(f) for f in direct], number=number, repeat=3))
+    mathml_time = min(timeit.repeat(lambda: [_convert_mathml(f) for f in direct], number=number, repeat=3))
+    per_formula = number * len(direct)
+    print(f"{name}: {len(direct)} из {len(formulas)} формул преобразуются напрямую\n"
+          f"  напрямую: {direct_time / per_formula * 1e6:.1f} мкс на формулу\n"
+          f"  через MathML: {mathml_time / per_formula * 1e6:.1f} мкс на формулу\n"
+          f"  ускорение: {mathml_time / direct_time:.1f}x")
+
+
+def main():
+    _convert_mathml("x")  # imports latex2mathml and compiles the stylesheet
+    parser = MarkdownParser(docx.Document())
+    for path in sys.argv[1:] or [EXAMPLE_PATH]:
+        with open(path, encoding="utf-8") as f:
+            measure(os.path.basename(path), parser.formulas(f.read()))
+    measure("синтетические", synthetic_formulas())
+
+
+if __name__ == "__main__":
+    main()
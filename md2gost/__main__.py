@@ -1,11 +1,88 @@
 #!/bin/python
 from argparse import ArgumentParser, BooleanOptionalAction
+import json
+import logging
 import os.path
 import sys
-from getpass import getuser
+import time
+from typing import TYPE_CHECKING
 
-from md2gost.parser import ParserFactory
-from .converter import Converter
+from .lru_cache import cache_stats
+from .watcher import Watcher
+
+if TYPE_CHECKING:
+    from .converter import Converter
+
+# seconds between checks of the watched files
+WATCH_INTERVAL = 0.5
+
+
+def print_profile(elapsed: float):
+    print(f"Время конвертации: {elapsed:.3f} с")
+    for stats in cache_stats():
+        print(f"Кэш {stats.name}: попаданий {stats.hits}, промахов {stats.misses} "
+              f"({stats.hit_rate:.0%}), записей {stats.size}/{stats.maxsize}")
+
+
+def watch(converter: "Converter", output: str, profile: bool):
+    """Converts the document again each time the input files or the files they include change"""
+    watcher = Watcher(converter.input_paths, converter.dependencies)
+    print("Отслеживание изменений, для выхода нажмите Ctrl+C")
+    try:
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            if not watcher.changed():
+                continue
+
+            start_time = time.perf_counter()
+            try:
+                converter.update()
+                converter.save()
+            except Exception as e:
+                logging.error(f"Не удалось пересобрать документ: {e}")
+                continue
+            finally:
+                watcher.set_dependencies(converter.dependencies)
+            print(f"Документ пересобран за {time.perf_counter() - start_time:.3f} с")
+            if profile:
+                print_profile(time.perf_counter() - start_time)
+    except KeyboardInterrupt:
+        return
+
+
+def batch(filenames: list[str], output_dir: str, template: str, title: str | None, title_pages: int,
+          jobs: int) -> int:
+    """Converts each input file to its own document in the output directory, returns the number of failures"""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from .converter import convert_file
+
+    outputs = [os.path.join(output_dir, os.path.splitext(os.path.basename(filename))[0] + ".docx")
+               for filename in filenames]
+    os.makedirs(output_dir, exist_ok=True)
+
+    start_time = time.perf_counter()
+    converted = 0
+    # workers are kept between the documents, so each process loads fonts and templates once
+    with ProcessPoolExecutor(jobs) as executor:
+        futures = {executor.submit(convert_file, filename, output, template, title, title_pages): (filename, output)
+                   for filename, output in zip(filenames, outputs)}
+        for future in as_completed(futures):
+            filename, output = futures[future]
+            try:
+                error = future.result()
+            except Exception as e:
+                # e.g. the worker process died, the other documents are still converted
+                error = f"{type(e).__name__}: {e}"
+            if error:
+                logging.error(f"Не удалось сконвертировать {filename}: {error}")
+            else:
+                converted += 1
+                print(f"Сгенерированный документ: {os.path.abspath(output)}")
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Сконвертировано документов: {converted} из {len(filenames)} за {elapsed:.3f} с "
+          f"({converted / elapsed:.2f} док/с)")
+    return len(filenames) - converted
 
 
 def main():
@@ -27,39 +104,98 @@ def main():
                         action=BooleanOptionalAction)
     parser.add_argument("--debug", help="Добавляет отладочные данные в документ",
                         action="store_true")
+    parser.add_argument("--profile", help="Выводит время конвертации и статистику кэшей",
+                        action="store_true")
+    parser.add_argument("--watch", help="Пересобирает документ при изменении входных файлов",
+                        action="store_true")
+    parser.add_argument("--layout-only", help="Только рассчитывает разметку страниц и выводит ее в формате JSON, \
+                            без генерации документа", action="store_true")
+    parser.add_argument("--batch", metavar="OUTPUT_DIR", help="Конвертирует каждый входной файл в отдельный \
+                            документ в папке OUTPUT_DIR")
+    parser.add_argument("-j", "--jobs", help="Количество процессов, в которых конвертируются главы документа",
+                        default=1, type=int)
+    parser.add_argument("--no-cache", help="Не использует кэш подсвеченных листингов и формул \
+                            предыдущих запусков", action="store_true")
+    parser.add_argument("--rebuild-font-index", help="Пересоздает индекс системных шрифтов",
+                        action="store_true")
 
     args = parser.parse_args()
     filenames, output, template, title, title_pages, debug = \
         args.filenames, args.output, args.template, args.title, args.title_pages, args.debug
     if args.syntax_highlighting:
         os.environ["SYNTAX_HIGHLIGHTING"] = "1"
+    if args.no_cache:
+        os.environ["MD2GOST_NO_CACHE"] = "1"
+
+    if args.rebuild_font_index:
+        from .renderable.font_index import get_font_index
+        print(f"Найдено шрифтов: {get_font_index().rebuild()}")
+        if not filenames:
+            return 0
 
     if not filenames:
         print("Нет входных файлов!")
         return -1
 
-    if output:
+    if args.jobs < 1:
+        print("Ошибка: количество процессов должно быть положительным")
+        return -1
+    # the incremental and debug conversions need the whole document in one process
+    jobs = 1 if args.watch or args.layout_only or debug else args.jobs
+
+    if not template:
+        template = os.path.join(os.path.dirname(__file__), "Template.docx")
+
+    if args.batch:
+        if output or args.watch or args.layout_only or debug:
+            print("Ошибка: флаги -o, --watch, --layout-only и --debug не используются с --batch")
+            return -1
+        names = [os.path.splitext(os.path.basename(filename))[0] for filename in filenames]
+        if len(set(names)) != len(names):
+            print("Ошибка: у входных файлов совпадают имена")
+            return -1
+        failed = batch(filenames, args.batch, template, title, title_pages, args.jobs)
+        return 1 if failed else 0
+
+    if args.layout_only:
+        if output and not output.endswith(".json"):
+            print("Ошибка: выходной файл разметки должен иметь расширение .json")
+            return -1
+    elif output:
         if not output.endswith(".docx"):
             print("Ошибка: выходной файл должен иметь расширение .docx")
             return -1
     else:
         output = os.path.basename(filenames[0]).replace(".md", ".docx")
 
-    if not template:
-        template = os.path.join(os.path.dirname(__file__), "Template.docx")
+    start_time = time.perf_counter()
 
-    converter = Converter(filenames, output, template, title, title_pages, debug)
+    # the converter imports the renderables and their dependencies, so --help and argument errors don't wait for it
+    from .converter import Converter
+    converter = Converter(filenames, output, template, title, title_pages, debug, args.layout_only, jobs)
     converter.convert()
 
-    document = converter.document
+    if args.layout_only:
+        page_map = json.dumps(converter.page_map(), ensure_ascii=False, indent=2)
+        if output:
+            with open(output, "w", encoding="utf-8") as f:
+                f.write(page_map)
+        else:
+            print(page_map)
+        if args.profile:
+            print_profile(time.perf_counter() - start_time)
+        return 0
 
-    document.core_properties.author = getuser()
-    document.core_properties.comments =\
-        "Создано при помощи https://github.com/witelokk/md2gost"
-
-    document.save(output)
+    converter.save()
     print(f"Сгенерированный документ: {os.path.abspath(output)}")
 
+    if args.profile:
+        print_profile(time.perf_counter() - start_time)
+
+    if args.watch:
+        watch(converter, output, args.profile)
+        return 0
+
     if debug:
         import platform
         if platform.system() == 'Darwin':       # macOS
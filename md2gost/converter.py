@@ -1,59 +1,132 @@
 import logging
 import os.path
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from getpass import getuser
 
 import docx
 from docx.document import Document
-from docx.shared import Cm
+from docx.opc.constants import RELATIONSHIP_TYPE
+from docx.shared import Cm, Length
 
 from .debugger import Debugger
+from .latex_math import convert_formulas
 from .layout_tracker import LayoutTracker
 from md2gost.processors.numbering_preprocessor import NumberingPreProcessor
 from .parser import ParserFactory
+from .parser.parser import Parser
+from .remote_images import fetch_images
 from .renderable import Renderable
+from .renderable.heading import Heading
+from .renderable.listing import highlighting_enabled, highlight_listings
+from .renderable.toc import ToC
 from .document_merger import DocumentMerger
+from .parallel import Source, RenderedChapter, HeadingItem, ChapterMerger, split_chapters, has_toc, export_body
 from md2gost.processors.toc.toc_processor import TocPreProcessor, TocPostProcessor
 from md2gost.processors.renderer import Renderer
 
 BOTTOM_MARGIN = Cm(1.86)
 
 
+def _create_layout_tracker(document: Document) -> LayoutTracker:
+    max_height = document.sections[-1].page_height - document.sections[0] \
+        .top_margin - BOTTOM_MARGIN  # - ((136 / 2) * (Pt(1)*72/96))  # todo add bottom margin detection with footer
+    max_width = document.sections[-1].page_width - document.sections[-1].left_margin \
+        - document.sections[-1].right_margin
+    return LayoutTracker(max_height, max_width)
+
+
+def _read_sources(input_paths: list[str]) -> list[Source]:
+    sources = []
+    for path in input_paths:
+        try:
+            with open(path, encoding="utf-8") as f:
+                sources.append((f.read(), path))
+        except FileNotFoundError:
+            print(f"Файл {path} не найден!")
+            exit(-3)
+    return sources
+
+
+def _parse_sources(document: Document, parser_factory: ParserFactory, sources: list[Source])\
+        -> tuple[list[Renderable], set[str]]:
+    renderables = []
+    dependencies = set()
+    for text, path in sources:
+        extension = path.split(".")[-1]
+        parser = parser_factory.create_by_extension(
+            extension, document)
+        if not parser:
+            logging.critical(f"Формат входных файлов {extension} не поддерживается")
+            sys.exit(-1)
+
+        renderables += \
+            list(parser.parse(text, os.path.dirname(os.path.abspath(path))))
+        dependencies |= parser.dependencies
+    return renderables, dependencies
+
+
+def convert_chapter(template_path: str, sources: list[Source]) -> RenderedChapter:
+    """Converts a chapter that starts with a level 1 heading, runs in a worker process"""
+    document: Document = docx.Document(template_path)
+    document._body.clear_content()
+    renderables, dependencies = _parse_sources(document, ParserFactory(), sources)
+
+    layout_tracker = _create_layout_tracker(document)
+    # the chapter starts after the previous one, on the first page here
+    layout_tracker.add_height(Length(1))
+
+    TocPreProcessor().process(renderables)
+    numbering = NumberingPreProcessor(warn_missing_references=False)
+    numbering.process(renderables)
+    Renderer(document, layout_tracker).process(renderables)
+
+    body, relationships = export_body(document)
+    headings = [HeadingItem(renderable.level, renderable.text, renderable.is_numbered, renderable.anchor,
+                            renderable.rendered_page)
+                for renderable in renderables if isinstance(renderable, Heading)]
+    return RenderedChapter(body, relationships, headings, numbering.numbers, numbering.references,
+                           layout_tracker.current_state.page, dependencies)
+
+
+def convert_file(input_path: str, output_path: str, template_path: str = None,
+                 title_path: str | None = None, title_pages: int = 1) -> str | None:
+    """Converts a markdown file to a docx file, returns the error if it failed"""
+    try:
+        converter = Converter([input_path], output_path, template_path, title_path, title_pages)
+        converter.convert()
+        converter.save()
+    except SystemExit as e:
+        # the reason is already reported
+        return f"код завершения {e.code}"
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
 class Converter:
-    """Converts markdown file to docx file"""
+    """Converts markdown file to docx file.
+
+    With jobs > 1 the document is split into chapters at level 1 headings, which start
+    new pages, and the chapters after the first one are converted in worker processes.
+    Listings of all chapters are highlighted and formulas converted in worker processes before that."""
 
     def __init__(self, input_paths: list[str], output_path: str,
-                 template_path: str = None, title_path: str | None = None, title_pages: int = 1, debug: bool = False):
+                 template_path: str = None, title_path: str | None = None, title_pages: int = 1, debug: bool = False,
+                 layout_only: bool = False, jobs: int = 1):
         self._output_path = output_path
+        self._input_paths = input_paths
+        self._template_path = template_path
+        self._jobs = jobs
         self._document: Document = docx.Document(template_path)
         self._pages_offset = 0
         self._document._body.clear_content()
         self._debugger = Debugger(self._document) if debug else None
-        self._renderables: list[Renderable] = []
-        parser_factory = ParserFactory()
-        for path in input_paths:
-            try:
-                with open(path, encoding="utf-8") as f:
-                    text = f.read()
-            except FileNotFoundError:
-                print(f"Файл {path} не найден!")
-                exit(-3)
-
-            extension = path.split(".")[-1]
-            parser = parser_factory.create_by_extension(
-                extension, self._document)
-            if not parser:
-                logging.critical(f"Формат входных файлов {extension} не поддерживается")
-                sys.exit(-1)
-
-            self._renderables += \
-                list(parser.parse(text, os.path.dirname(os.path.abspath(path))))
-
-        max_height = self._document.sections[-1].page_height - self._document.sections[0] \
-            .top_margin - BOTTOM_MARGIN  # - ((136 / 2) * (Pt(1)*72/96))  # todo add bottom margin detection with footer
-        max_width = self._document.sections[-1].page_width - self._document.sections[-1].left_margin \
-            - self._document.sections[-1].right_margin
-
-        self._layout_tracker = LayoutTracker(max_height, max_width)
+        self._parser_factory = ParserFactory()
+        self._dependencies: set[str] = set()
+        self._renderables: list[Renderable] | None = self._parse() if jobs == 1 else None
+
+        self._layout_tracker = _create_layout_tracker(self._document)
 
         if title_path:
             title_document: Document = docx.Document(title_path)
@@ -63,17 +136,151 @@ class Converter:
             for _ in range(title_pages-1):
                 self._layout_tracker.new_page()
 
+        # kept between conversions, so converting changed renderables reuses the unchanged output
+        self._renderer = Renderer(self._document, self._layout_tracker, self._debugger, layout_only)
+
+    def _parse(self, sources: list[Source] | None = None) -> list[Renderable]:
+        if sources is None:
+            sources = _read_sources(self._input_paths)
+        fetch_images([url for parser, text, _ in self._parsers(sources) for url in parser.images(text)])
+        renderables, self._dependencies = _parse_sources(self._document, self._parser_factory, sources)
+        return renderables
+
+    def _parsers(self, sources: list[Source]) -> list[tuple[Parser, str, str]]:
+        """Returns the parsers of the sources with the supported formats with their texts and paths"""
+        parsers = []
+        for text, path in sources:
+            parser = self._parser_factory.create_by_extension(path.split(".")[-1], self._document)
+            if parser:
+                parsers.append((parser, text, path))
+        return parsers
+
+    def update(self):
+        """Parses the input files again and converts the document, the output
+        of the unchanged part of the document is reused. After a failed update
+        the next one converts the whole document"""
+        try:
+            self._renderables = self._parse()
+            self.convert()
+        except Exception:
+            self._renderer.reset()
+            raise
+        self._drop_unused_images()
+
+    def _drop_unused_images(self):
+        """Removes the relationships of the images that are no longer in the document,
+        so the replaced images aren't saved with it"""
+        used = set(self._document.element.xpath(".//@r:embed"))
+        relationships = self._document.part.rels
+        for r_id, relationship in list(relationships.items()):
+            if relationship.reltype == RELATIONSHIP_TYPE.IMAGE and r_id not in used:
+                del relationships[r_id]
+
+    @property
+    def input_paths(self) -> list[str]:
+        return self._input_paths
+
+    @property
+    def dependencies(self) -> set[str]:
+        """Paths of the local files (images, code) included by the input files"""
+        return self._dependencies
+
     def convert(self):
+        if self._renderables is None:
+            sources = _read_sources(self._input_paths)
+            self._convert_ahead(sources)
+            chapters = split_chapters(sources)
+            # the table of contents is rendered with the first chapter
+            if len(chapters) > 1 and not any(has_toc(chapter) for chapter in chapters[1:]):
+                self._convert_chapters(chapters)
+                return
+            self._renderables = self._parse(sources)
+
         processors = [
             TocPreProcessor(),
             NumberingPreProcessor(),
-            Renderer(self._document, self._layout_tracker, self._debugger),
+            self._renderer,
             TocPostProcessor(self._pages_offset),
         ]
 
         for processor in processors:
             processor.process(self._renderables)
 
+    def _convert_ahead(self, sources: list[Source]):
+        """Highlights the listings and converts the formulas of all chapters in worker processes
+        and fetches the remote images beforehand"""
+        listings = []
+        formulas = []
+        urls = []
+        for parser, text, path in self._parsers(sources):
+            if highlighting_enabled():
+                listings += parser.listings(text, os.path.dirname(os.path.abspath(path)))
+            formulas += parser.formulas(text)
+            urls += parser.images(text)
+        highlight_listings(listings, self._jobs)
+        convert_formulas(formulas, self._jobs)
+        fetch_images(urls)
+
+    def _convert_chapters(self, chapters: list[list[Source]]):
+        with ProcessPoolExecutor(min(self._jobs, len(chapters) - 1)) as executor:
+            futures = [executor.submit(convert_chapter, self._template_path, chapter) for chapter in chapters[1:]]
+
+            # the first chapter is converted here meanwhile, unless the table of contents needs the other headings
+            self._renderables = self._parse(chapters[0])
+            TocPreProcessor().process(self._renderables)
+            numbering = NumberingPreProcessor(warn_missing_references=False)
+            numbering.process(self._renderables)
+            toc = next((renderable for renderable in self._renderables if isinstance(renderable, ToC)), None)
+            if not toc:
+                self._renderer.process(self._renderables)
+
+            rendered_chapters = [future.result() for future in futures]
+
+        merger = ChapterMerger(self._document, numbering.numbers, numbering.references,
+                               [(renderable.level, renderable.text) for renderable in self._renderables
+                                if isinstance(renderable, Heading)])
+        headings = [merger.add_headings(chapter) for chapter in rendered_chapters]
+        if toc:
+            toc_index = sum(isinstance(renderable, Heading)
+                            for renderable in self._renderables[self._renderables.index(toc):])
+            for heading in (heading for chapter_headings in headings for heading in chapter_headings):
+                toc.add_item(heading.level, heading.text, heading.numbered, heading.anchor)
+            self._renderer.process(self._renderables)
+            TocPostProcessor(self._pages_offset).process(self._renderables)
+
+        # pages of a chapter are counted from the last page of the previous one
+        last_page = self._layout_tracker.current_state.page
+        for chapter, chapter_headings in zip(rendered_chapters, headings):
+            merger.append(chapter)
+            for heading in chapter_headings:
+                if toc:
+                    toc.set_page(toc_index, heading.page + last_page - 1)
+                    toc_index += 1
+            last_page += chapter.last_page - 1
+            self._dependencies |= chapter.dependencies
+        merger.set_references()
+
+    def page_map(self) -> dict:
+        """Returns the pages of the converted blocks, y offsets are in points"""
+        blocks = []
+        for layout in self._renderer.block_layouts():
+            block = {
+                "type": type(layout.renderable).__name__,
+                "start_page": layout.start_page,
+                "end_page": layout.end_page,
+                "y_offset": round(layout.y_offset.pt, 2),
+            }
+            if isinstance(layout.renderable, Heading):
+                block["text"] = layout.renderable.text
+            blocks.append(block)
+        return {"pages": self._layout_tracker.current_state.page, "blocks": blocks}
+
+    def save(self):
+        self._document.core_properties.author = getuser()
+        self._document.core_properties.comments = \
+            "Создано при помощи https://github.com/witelokk/md2gost"
+        self._document.save(self._output_path)
+
     @property
     def document(self) -> Document:
         return self._document
@@ -0,0 +1,125 @@
+import hashlib
+import logging
+import os
+from collections.abc import Callable
+from importlib.metadata import version, PackageNotFoundError
+
+from .util import get_cache_dir
+
+
+def _md2gost_version() -> str:
+    try:
+        return version("md2gost")
+    except PackageNotFoundError:
+        return "dev"
+
+
+def disk_caches_enabled() -> bool:
+    """Returns whether the values cached on disk are used (MD2GOST_NO_CACHE disables them)"""
+    return os.environ.get("MD2GOST_NO_CACHE") != "1"
+
+
+class DiskCache:
+    """Byte values kept between runs in a subdirectory of the cache directory, one file per key.
+
+    Keys are tuples of strings. The version of md2gost is a part of every key, so an updated
+    md2gost doesn't use the values of the old one. Reading and writing errors make a miss.
+
+    With max_size, the least recently used files are removed when the files take more
+    than max_size bytes. A hit updates the modification time of the file for that."""
+
+    def __init__(self, name: str, max_size: int | None = None):
+        self.name = name
+        self._version = _md2gost_version()
+        self._max_size = max_size
+        self._size: int | None = None  # of the files, found on the first put
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return disk_caches_enabled()
+
+    def _dir(self) -> str:
+        return os.path.join(get_cache_dir(), self.name)
+
+    def _path(self, key: tuple[str, ...]) -> str:
+        digest = hashlib.sha1("\0".join((self._version, *key)).encode()).hexdigest()
+        return os.path.join(self._dir(), digest[:2], digest[2:])
+
+    def __contains__(self, key: tuple[str, ...]):
+        return self.enabled and os.path.exists(self._path(key))
+
+    def get(self, key: tuple[str, ...]) -> bytes | None:
+        if not self.enabled:
+            self.misses += 1
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+            if self._max_size is not None:
+                os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key: tuple[str, ...], value: bytes):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Не удалось сохранить кэш {self.name}: {e}")
+            return
+
+        if self._max_size is not None:
+            self._size = self._size + len(value) if self._size is not None else self._files_size()
+            if self._size > self._max_size:
+                self._evict()
+
+    def get_or_create(self, key: tuple[str, ...], factory: Callable[[], bytes]) -> bytes:
+        """Returns the cached value for the key, calling factory on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def _files(self) -> list[tuple[float, int, str]]:
+        """Returns the modification time, the size and the path of the cached values"""
+        files = []
+        for dir_path, _, file_names in os.walk(self._dir()):
+            for file_name in file_names:
+                if file_name.endswith(".tmp"):
+                    continue
+                path = os.path.join(dir_path, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _files_size(self) -> int:
+        return sum(size for _, size, _ in self._files())
+
+    def _evict(self):
+        # down to 3/4 of the limit, so the directory isn't scanned on every put
+        files = sorted(self._files())
+        self._size = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if self._size <= self._max_size * 3 // 4:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
@@ -3,11 +3,9 @@ from io import BytesIO
 from docx.document import Document
 from docx.oxml.ns import qn
 from docx.oxml import CT_P, CT_Tbl, CT_Blip
-from docx.styles.style import _ParagraphStyle
 from docx.text.paragraph import Paragraph
-from docx.text.parfmt import ParagraphFormat
 
-from md2gost.util import merge_objects
+from md2gost.style_table import get_style_table
 
 
 class DocumentMerger:
@@ -16,31 +14,15 @@ class DocumentMerger:
 
     def append(self, other_document: Document, pages: int = None):
         # copy element styles to element
-        default_style_element = type("DefaultStyle", (), {})
-        default_style_element.rPr = \
-            other_document.styles.element.xpath(
-                'w:docDefaults/w:rPrDefault/w:rPr')[0]
-        default_style_element.pPr = \
-            other_document.part.document.styles.element.xpath(
-                'w:docDefaults/w:pPrDefault/w:pPr')[0]
-        default_style = _ParagraphStyle(default_style_element)
+        style_table = get_style_table(other_document.part)
 
         for element in other_document._body._element.iter():
             if isinstance(element, CT_P):
                 p = Paragraph(element, other_document._body)
-                styles = [p.style]
-                while styles[-1].base_style:
-                    styles.append(styles[-1].base_style)
-                styles.append(default_style)
-                pf = merge_objects(
-                    *[style.paragraph_format for style in styles][::-1],
-                    p.paragraph_format)
-                for attr, value in pf.__dict__.items():
-                    try:
-                        p.paragraph_format.__setattr__(
-                            attr, value if value is not None else 0)
-                    except AttributeError:
-                        pass
+                pf = style_table.paragraph_format(p)
+                for attr, value in vars(pf).items():
+                    p.paragraph_format.__setattr__(
+                        attr, value if value is not None else 0)
             elif isinstance(element, CT_Blip):
                 r_id = element.attrib[qn("r:embed")]
                 image_blob = BytesIO(
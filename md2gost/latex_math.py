@@ -1,21 +1,270 @@
+import hashlib
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 from copy import deepcopy
+from functools import cache
+from importlib.metadata import version
 
 from lxml import etree
 
-import latex2mathml.converter
 from lxml.etree import _Element
 
+from .disk_cache import DiskCache
+from .lru_cache import LRUCache
 
-def latex_to_omml(latex_equation: str) -> _Element:
+FORMULA_CACHE_SIZE = 1024
+FORMULA_DISK_CACHE_SIZE = 32 * 1024 * 1024
+
+INLINE_FORMULA_CACHE_SIZE = 4096
+
+_MML2OMML_PATH = os.path.join(os.path.dirname(__file__), "mml2omml")
+
+_MATH_NAMESPACES = {"m": "http://schemas.openxmlformats.org/officeDocument/2006/math"}
+_fractions = etree.XPath(".//m:f", namespaces=_MATH_NAMESPACES)
+_numerator = etree.XPath("m:num", namespaces=_MATH_NAMESPACES)
+_denominator = etree.XPath("m:den", namespaces=_MATH_NAMESPACES)
+_RUN_TAG = f"{{{_MATH_NAMESPACES['m']}}}r"
+_RUN_PROPERTIES_TAG = f"{{{_MATH_NAMESPACES['m']}}}rPr"
+# namespaces of the root element that the stylesheet makes
+_OMML_NSMAP = {**_MATH_NAMESPACES, "mml": "http://www.w3.org/1998/Math/MathML"}
+
+# the subset of LaTeX that _translate converts, see it for the structures
+_SYMBOLS = {
+    "alpha": "α", "beta": "β", "gamma": "γ", "delta": "δ", "epsilon": "ϵ", "varepsilon": "ε",
+    "zeta": "ζ", "eta": "η", "theta": "θ", "vartheta": "ϑ", "iota": "ι", "kappa": "κ",
+    "lambda": "λ", "mu": "μ", "nu": "ν", "xi": "ξ", "pi": "π", "varpi": "ϖ", "rho": "ρ",
+    "varrho": "ϱ", "sigma": "σ", "varsigma": "ς", "tau": "τ", "upsilon": "υ", "phi": "ϕ",
+    "varphi": "φ", "chi": "χ", "psi": "ψ", "omega": "ω",
+    "Gamma": "Γ", "Delta": "Δ", "Theta": "Θ", "Lambda": "Λ", "Xi": "Ξ", "Pi": "Π", "Sigma": "Σ",
+    "Upsilon": "Υ", "Phi": "Φ", "Psi": "Ψ", "Omega": "Ω",
+    "cdot": "·", "times": "×", "pm": "±", "mp": "∓", "div": "÷", "le": "≤", "leq": "≤",
+    "ge": "≥", "geq": "≥", "ne": "≠", "neq": "≠", "approx": "≈", "equiv": "≡", "sim": "~",
+    "to": "→", "rightarrow": "→", "leftarrow": "←", "infty": "∞", "partial": "∂", "nabla": "∇",
+    "in": "∈", "notin": "∉", "subset": "⊂", "subseteq": "⊆", "cup": "∪", "cap": "∩",
+    "forall": "∀", "exists": "∃", "ldots": "…", "cdots": "⋯", "circ": "∘", "degree": "°",
+    "prime": "′", "angle": "∠", "perp": "⟂", "parallel": "∥",
+}
+_FUNCTIONS = {"sin", "cos", "tan", "ln", "log", "exp"}
+_NARY_OPERATORS = {"sum": "∑", "prod": "∏", "int": "∫"}
+_OPERATORS = {"-": "−", **{c: c for c in "+=<>,.;:!()[]|*"}}
+# the tokens of latex2mathml: a digit right after a script operator and the digits of \frac12 are
+# separate tokens, other digits make numbers. Dimensions like 2cm and decimals like .5 aren't translated
+_TOKEN = re.compile(r"([_^])(\d)|(-?\d+(?:\.\d+)?\s*(?:in|mm|cm|pt|em|ex|pc|bp|dd|cc|sp|mu))|(\d+(?:\.\d+)?)|(\.\d*)"
+                    r"|(\\frac)\s*([.\d])\s*([.\d])?|(\\[a-zA-Z]+|\\.)|\s+|(.)", re.S)
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+# OMML of the formulas by the LaTeX, formulas often repeat in a document
+formula_cache = LRUCache("formulas", FORMULA_CACHE_SIZE)
+# OMML of the inline formulas by the LaTeX
+inline_formula_cache = LRUCache("inline formulas", INLINE_FORMULA_CACHE_SIZE)
+# serialized OMML of the formulas converted in the previous runs
+_formula_disk_cache = DiskCache("formulas", FORMULA_DISK_CACHE_SIZE)
+
+
+@cache
+def _mml2omml() -> etree.XSLT:
+    return etree.XSLT(etree.parse(_MML2OMML_PATH))
+
+
+@cache
+def _converter_key() -> tuple[str, str]:
+    """Returns what the conversion depends on besides the formula"""
+    with open(_MML2OMML_PATH, "rb") as f:
+        stylesheet_hash = hashlib.sha1(f.read()).hexdigest()
+    return f"latex2mathml {version('latex2mathml')}", stylesheet_hash
+
+
+class _Unsupported(Exception):
+    """The formula is outside of the subset that _translate converts"""
+
+
+def _m(tag: str, parent: _Element | None = None, val: str | None = None) -> _Element:
+    name = f"{{{_MATH_NAMESPACES['m']}}}{tag}"
+    element = etree.Element(name, nsmap=_OMML_NSMAP) if parent is None else etree.SubElement(parent, name)
+    if val is not None:
+        element.set(f"{{{_MATH_NAMESPACES['m']}}}val", val)
+    return element
+
+
+def _is_function(item: str | _Element) -> bool:
+    return not isinstance(item, str) and item.tag == _RUN_TAG and item[0].tag == _RUN_PROPERTIES_TAG
+
+
+def _fill(parent: _Element, items: list[str | _Element]) -> _Element:
+    """Appends the items to the parent, the adjacent texts and the adjacent functions make one run"""
+    text = ""
+    for item in [*items, None]:
+        if isinstance(item, str):
+            text += item
+            continue
+        if text:
+            _m("t", _m("r", parent)).text = text
+            text = ""
+        if item is None:
+            continue
+        if _is_function(item) and len(parent) and _is_function(parent[-1]):
+            parent[-1][-1].text += item[-1].text
+        else:
+            parent.append(item)
+    return parent
+
+
+class _Translator:
+    """Builds OMML of a formula from its LaTeX tokens, as latex2mathml and the stylesheet do.
+    Texts are the letters, digits, operators and symbols, elements are the rest"""
+
+    def __init__(self, latex_equation: str):
+        self._tokens = [token for match in _TOKEN.finditer(latex_equation) for token in match.groups() if token]
+        self._position = 0
+
+    def translate(self) -> _Element:
+        items = self._sequence(None)
+        if not items:
+            raise _Unsupported()
+        return _fill(_m("oMath"), items)
+
+    def _next(self) -> str:
+        if self._position == len(self._tokens):
+            raise _Unsupported()
+        self._position += 1
+        return self._tokens[self._position - 1]
+
+    def _peek(self) -> str | None:
+        return self._tokens[self._position] if self._position < len(self._tokens) else None
+
+    def _sequence(self, closing: str | None) -> list[str | _Element]:
+        items = []
+        while self._peek() != closing:
+            if self._peek() == "}":
+                raise _Unsupported()
+            items.append(self._scripted())
+        if closing is not None:
+            self._next()
+        return items
+
+    def _group(self) -> list[str | _Element]:
+        if self._next() != "{":
+            raise _Unsupported()
+        items = self._sequence("}")
+        if not items:
+            raise _Unsupported()
+        return items
+
+    def _argument(self) -> list[str | _Element]:
+        """Returns a braced group or a single token"""
+        if self._peek() == "{":
+            return self._group()
+        return [self._atom(self._next())]
+
+    def _scripts(self) -> tuple[list[str | _Element] | None, list[str | _Element] | None]:
+        sub = sup = None
+        while self._peek() in ("_", "^"):
+            if self._next() == "_":
+                if sub is not None:
+                    raise _Unsupported()
+                sub = self._argument()
+            else:
+                if sup is not None:
+                    raise _Unsupported()
+                sup = self._argument()
+        return sub, sup
+
+    def _scripted(self) -> str | _Element:
+        token = self._peek()
+        if token in ("\\sum", "\\prod", "\\int"):
+            self._next()
+            return self._nary(_NARY_OPERATORS[token[1:]])
+        base = self._argument()
+        sub, sup = self._scripts()
+        if sub is None and sup is None:
+            if token == "{":
+                raise _Unsupported()  # a group without scripts keeps its own row
+            return base[0]
+        script = _m("sSubSup" if sub is not None and sup is not None else "sSub" if sub is not None else "sSup")
+        _fill(_m("e", script), base)
+        if sub is not None:
+            _fill(_m("sub", script), sub)
+        if sup is not None:
+            _fill(_m("sup", script), sup)
+        return script
+
+    def _nary(self, character: str) -> str | _Element:
+        sub, sup = self._scripts()
+        if sub is None and sup is None:
+            return character
+        nary = _m("nary")
+        properties = _m("naryPr", nary)
+        _m("chr", properties, character)
+        _m("limLoc", properties, "subSup")
+        _m("grow", properties, "1")
+        _m("subHide", properties, "on" if sub is None else "off")
+        _m("supHide", properties, "on" if sup is None else "off")
+        _fill(_m("sub", nary), sub or [])
+        _fill(_m("sup", nary), sup or [])
+        # a group right after the limits is the operand, anything else follows the operator
+        _fill(_m("e", nary), self._group() if self._peek() == "{" else [])
+        return nary
+
+    def _atom(self, token: str) -> str | _Element:
+        if token[0] == "\\" and token[1:] in _SYMBOLS:
+            return _SYMBOLS[token[1:]]
+        if token[0] == "\\" and token[1:] in _FUNCTIONS:
+            run = _m("r")
+            _m("sty", _m("rPr", run), "p")
+            _m("t", run).text = token[1:]
+            return run
+        if token == "\\frac":
+            fraction = _m("f")
+            _m("type", _m("fPr", fraction), "bar")
+            _fill(_m("num", fraction), self._argument())
+            _fill(_m("den", fraction), self._argument())
+            return fraction
+        if token == "\\sqrt":
+            radical = _m("rad")
+            degree = self._degree()
+            _m("degHide", _m("radPr", radical), "off" if degree else "on")
+            _fill(_m("deg", radical), degree)
+            _fill(_m("e", radical), self._argument())
+            return radical
+        if token in _OPERATORS:
+            return _OPERATORS[token]
+        if token.isascii() and token.isalpha() and len(token) == 1 or _NUMBER.fullmatch(token):
+            return token
+        raise _Unsupported()
+
+    def _degree(self) -> list[str | _Element]:
+        if self._peek() != "[":
+            return []
+        self._next()
+        degree = self._sequence("]")
+        if not degree:
+            raise _Unsupported()
+        return degree
+
+
+def _translate(latex_equation: str) -> _Element:
+    r"""Converts a formula of the common subset of LaTeX directly to OMML, the same as the MathML
+    conversion does. The subset is latin letters, numbers, the operators of _OPERATORS, the symbols
+    of _SYMBOLS, the functions of _FUNCTIONS, subscripts and superscripts of a token or a braced
+    group, \frac, \sqrt with an optional degree and \sum, \prod, \int with optional limits.
+    Raises _Unsupported for anything else"""
+    return _Translator(latex_equation).translate()
+
+
+def _convert(latex_equation: str) -> _Element:
+    try:
+        return _translate(latex_equation)
+    except _Unsupported:
+        return _convert_mathml(latex_equation)
+
+
+def _convert_mathml(latex_equation: str) -> _Element:
+    import latex2mathml.converter  # slow to import, only documents with equations need it
     try:
         mathml = latex2mathml.converter.convert(latex_equation)
         tree = etree.fromstring(mathml)
-        xslt = etree.parse(
-            os.path.join(os.path.dirname(__file__), "mml2omml")
-        )
-        transform = etree.XSLT(xslt)
-        new_dom = transform(tree)
+        new_dom = _mml2omml()(tree)
         word_math = new_dom.getroot()
     except Exception:
         raise ValueError(f"Can't parse the formula:\n{latex_equation}")
@@ -23,6 +272,62 @@ def latex_to_omml(latex_equation: str) -> _Element:
     return word_math
 
 
+def _load_or_convert(latex_equation: str) -> _Element:
+    key = (latex_equation, *_converter_key())
+    omml = _formula_disk_cache.get(key)
+    if omml is not None:
+        return etree.fromstring(omml)
+    word_math = _convert(latex_equation)
+    _formula_disk_cache.put(key, etree.tostring(word_math))
+    return word_math
+
+
+def _convert_serialized(latex_equation: str) -> bytes | None:
+    """Returns the serialized OMML of the formula or None if it can't be parsed, runs in worker processes"""
+    try:
+        return etree.tostring(_convert(latex_equation))
+    except ValueError:
+        return None
+
+
+def convert_formulas(formulas: list[str], jobs: int):
+    """Converts the formulas that aren't cached in worker processes and caches them,
+    so latex_to_omml takes them from the cache"""
+    if not _formula_disk_cache.enabled:
+        # without the disk cache the chapter workers would convert the formulas again
+        return
+    missing = []
+    for latex_equation in dict.fromkeys(formulas):
+        key = (latex_equation, *_converter_key())
+        if latex_equation in formula_cache or key in _formula_disk_cache:
+            continue
+        missing.append(latex_equation)
+    if len(missing) < 2:
+        return
+
+    with ProcessPoolExecutor(min(jobs, len(missing))) as executor:
+        # the formulas are short, so they are sent in chunks
+        for latex_equation, omml in zip(missing, executor.map(_convert_serialized, missing,
+                                                              chunksize=max(1, len(missing) // (jobs * 4)))):
+            if omml is None:
+                continue  # latex_to_omml reports it
+            _formula_disk_cache.put((latex_equation, *_converter_key()), omml)
+            formula_cache.put(latex_equation, etree.fromstring(omml))
+
+
+def latex_to_omml(latex_equation: str) -> _Element:
+    """Returns a new OMML element of the formula"""
+    return deepcopy(formula_cache.get_or_create(latex_equation, lambda: _load_or_convert(latex_equation)))
+
+
+def _is_single_term(part: _Element) -> bool:
+    """Returns whether a numerator or a denominator needs no parentheses when written in a line"""
+    if len(part) != 1:
+        return False
+    # a run holds an operator and its operands, e.g. "a+b"
+    return part[0].tag != _RUN_TAG or "".join(part[0].itertext()).isalnum()
+
+
 def inline_omml(omml: _Element):
     omml = deepcopy(omml)
 
@@ -35,13 +340,13 @@ def inline_omml(omml: _Element):
 
     nsmap = omml.nsmap
 
-    for fraction in omml.xpath("//m:f", namespaces=nsmap):
-        num = fraction.xpath('./m:num', namespaces=nsmap)[0]
-        den = fraction.xpath('./m:den', namespaces=nsmap)[0]
+    for fraction in _fractions(omml):
+        num = _numerator(fraction)[0]
+        den = _denominator(fraction)[0]
 
         new_elements = []
 
-        if len(num) == 1:
+        if _is_single_term(num):
             new_elements += num
         else:
             new_elements.append(new_r_with_t("("))
@@ -50,7 +355,7 @@ def inline_omml(omml: _Element):
 
         new_elements.append(new_r_with_t("/"))
 
-        if len(den) == 1:
+        if _is_single_term(den):
             new_elements += den
         else:
             new_elements.append(new_r_with_t("("))
@@ -62,3 +367,9 @@ def inline_omml(omml: _Element):
         fraction.getparent().remove(fraction)
 
     return omml
+
+
+def inline_latex_to_omml(latex_equation: str) -> _Element:
+    """Returns a new OMML element of the formula with the fractions written in a line"""
+    return deepcopy(inline_formula_cache.get_or_create(
+        latex_equation, lambda: inline_omml(latex_to_omml(latex_equation))))
@@ -52,3 +52,8 @@ class LayoutTracker:
     def new_page(self):
         self._state.new_page()
 
+    def restore(self, state: LayoutState):
+        """Continues the layout from the state"""
+        self._state = copy(state)
+        self._is_new_page = False
+
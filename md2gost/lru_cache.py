@@ -0,0 +1,105 @@
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from typing import Any
+from weakref import WeakSet
+
+_caches: "WeakSet[LRUCache]" = WeakSet()
+
+
+@dataclass
+class CacheStats:
+    name: str
+    hits: int = 0
+    misses: int = 0
+    size: int = 0
+    maxsize: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entries
+    and counts hits and misses"""
+
+    def __init__(self, name: str, maxsize: int):
+        if maxsize < 1:
+            raise ValueError("Cache size must be positive")
+        self.name = name
+        self._maxsize = maxsize
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        _caches.add(self)
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, value: int):
+        if value < 1:
+            raise ValueError("Cache size must be positive")
+        self._maxsize = value
+        self._evict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key: Hashable):
+        return key in self._data
+
+    def get(self, key: Hashable, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        self._evict()
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]):
+        """Returns the cached value for the key, calling factory on a miss"""
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            value = factory()
+            self.put(key, value)
+            return value
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def clear(self):
+        self._data.clear()
+        self.hits = self.misses = 0
+
+    def _evict(self):
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+    @property
+    def stats(self) -> CacheStats:
+        return CacheStats(self.name, self.hits, self.misses, len(self._data), self._maxsize)
+
+
+def cache_stats() -> list[CacheStats]:
+    """Returns statistics of all live caches, caches with the same name are summed up"""
+    stats: dict[str, CacheStats] = {}
+    for cache in list(_caches):
+        total = stats.setdefault(cache.name, CacheStats(cache.name))
+        total.hits += cache.hits
+        total.misses += cache.misses
+        total.size += len(cache)
+        total.maxsize += cache.maxsize
+    return sorted(stats.values(), key=lambda s: s.name)
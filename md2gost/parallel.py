@@ -0,0 +1,159 @@
+import logging
+import re
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from io import BytesIO
+
+from docx.document import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsmap, qn
+from lxml import etree
+
+from .parser.markdown_parser import split_chunks
+from .processors.toc.toc_processor import heading_anchor
+from .util import create_element
+
+# markdown text and the path of its file
+Source = tuple[str, str]
+
+_LEVEL_1_HEADING = re.compile(r" {0,3}#(?:[ \t]|\r?\n|$)")
+_TOC = re.compile(r"^ {0,3}\[TOC\]", re.M)
+_RELATIONSHIP_NAMESPACE = f"{{{nsmap['r']}}}"
+
+
+def split_chapters(sources: list[Source]) -> list[list[Source]]:
+    """Splits the sources before the level 1 headings that start chunks (see split_chunks).
+    The first chapter is the text before the first heading, if there is any"""
+    chapters: list[list[Source]] = [[]]
+    for text, path in sources:
+        part = ""
+        for chunk in split_chunks(text):
+            if _LEVEL_1_HEADING.match(chunk):
+                if part:
+                    chapters[-1].append((part, path))
+                chapters.append([])
+                part = ""
+            part += chunk
+        if part:
+            chapters[-1].append((part, path))
+    return [chapter for chapter in chapters if chapter]
+
+
+def has_toc(chapter: list[Source]) -> bool:
+    return any(_TOC.search(text) for text, _ in chapter)
+
+
+@dataclass
+class HeadingItem:
+    level: int
+    text: str
+    numbered: bool
+    anchor: str
+    page: int
+
+
+@dataclass
+class RenderedChapter:
+    """A chapter converted in a worker process. Pages are counted from the page
+    the previous chapter ends on, numbers of the captions from 1"""
+    body: bytes  # w:body with the rendered elements
+    relationships: dict[str, tuple[str, bool, str | bytes]]  # rId: type, is external, url or image blob
+    headings: list[HeadingItem]
+    numbers: dict[str, int]  # numbered elements by category
+    references: dict[str, tuple[str, int]]  # unique name: category, number
+    last_page: int
+    dependencies: set[str] = field(default_factory=set)
+
+
+def export_body(document: Document) -> tuple[bytes, dict[str, tuple[str, bool, str | bytes]]]:
+    """Returns the rendered elements of the document and the relationships they use"""
+    body = create_element("w:body", [element for element in document._body._element
+                                     if element.tag != qn("w:sectPr")])
+    relationships = {}
+    for element in body.iter():
+        for name, value in element.attrib.items():
+            if name.startswith(_RELATIONSHIP_NAMESPACE) and value not in relationships:
+                relationship = document.part.rels[value]
+                relationships[value] = (relationship.reltype, relationship.is_external,
+                                        relationship.target_ref if relationship.is_external
+                                        else relationship.target_part.blob)
+    return etree.tostring(body), relationships
+
+
+class ChapterMerger:
+    """Appends chapters converted in worker processes to the document.
+
+    Captions, references and heading anchors are numbered as in the document converted
+    at once: add_headings must be called for the chapters in order before they are appended."""
+
+    def __init__(self, document: Document, numbers: dict[str, int], references: dict[str, tuple[str, int]],
+                 headings: list[tuple[int, str]]):
+        self._document = document
+        self._numbers = Counter(numbers)
+        self._references = dict(references)
+        self._occurrences = Counter(headings)
+        # new anchors by the anchors in the chapters that add_headings got
+        self._anchors: deque[dict[str, str]] = deque()
+
+    def add_headings(self, chapter: RenderedChapter) -> list[HeadingItem]:
+        """Returns the headings of the chapter with the anchors they have in the document"""
+        anchors = {}
+        headings = []
+        for heading in chapter.headings:
+            self._occurrences[heading.level, heading.text] += 1
+            anchor = heading_anchor(heading.level, heading.text, self._occurrences[heading.level, heading.text])
+            anchors[heading.anchor] = anchor
+            headings.append(HeadingItem(heading.level, heading.text, heading.numbered, anchor, heading.page))
+        self._anchors.append(anchors)
+        return headings
+
+    def append(self, chapter: RenderedChapter):
+        body = parse_xml(chapter.body)
+        self._relate(body, chapter.relationships)
+
+        next_id = self._document.part.next_id
+        for doc_pr in body.xpath(".//wp:docPr"):
+            doc_pr.set("id", str(next_id))
+            next_id += 1
+
+        anchors = self._anchors.popleft()
+        for bookmark in body.iter(qn("w:bookmarkStart"), qn("w:bookmarkEnd")):
+            anchor = anchors.get(bookmark.get(qn("w:id")))
+            if anchor:
+                bookmark.set(qn("w:id"), anchor)
+                if bookmark.tag == qn("w:bookmarkStart"):
+                    bookmark.set(qn("w:name"), anchor)
+
+        for run in body.xpath(".//w:fldSimple[starts-with(@w:instr, 'SEQ ')]/w:r"):
+            category = run.getparent().get(qn("w:instr")).split()[1]
+            run.text = str(int(run.text) + self._numbers[category])
+
+        for name, (category, number) in chapter.references.items():
+            if name in self._references:
+                logging.warning(f"Дублирование названия подписи: {name}. Ссылки будут созданы некорректно")
+            self._references[name] = category, number + self._numbers[category]
+        self._numbers.update(chapter.numbers)
+
+        for element in list(body):
+            self._document._body._element.append(element)
+
+    def set_references(self):
+        """Sets the numbers of the references in the document"""
+        for instr_text in self._document._body._element.xpath(".//w:instrText[starts-with(., 'REF ')]"):
+            name = instr_text.text.split()[1]
+            if name in self._references:
+                instr_text.getparent().xpath("w:t")[0].text = str(self._references[name][1])
+            else:
+                logging.warning(f"Неверная ссылка: {name} не существует")
+
+    def _relate(self, body, relationships: dict[str, tuple[str, bool, str | bytes]]):
+        r_ids = {}
+        for r_id, (reltype, is_external, target) in relationships.items():
+            if is_external:
+                r_ids[r_id] = self._document.part.relate_to(target, reltype, is_external=True)
+            else:
+                r_ids[r_id], _ = self._document.part.get_or_add_image(BytesIO(target))
+        for element in body.iter():
+            for name, value in element.attrib.items():
+                if name.startswith(_RELATIONSHIP_NAMESPACE):
+                    element.set(name, r_ids[value])
@@ -1,6 +1,9 @@
+import hashlib
 import logging
 import os
+import re
 from collections.abc import Generator
+from copy import deepcopy
 
 from docx import Document
 from marko.block import BlankLine, Paragraph, CodeBlock, FencedCode, \
@@ -8,7 +11,8 @@ from marko.block import BlankLine, Paragraph, CodeBlock, FencedCode, \
 from marko.inline import Image
 from uuid import uuid4
 
-from md2gost.extended_markdown import markdown, Caption
+from md2gost.extended_markdown import markdown, Caption, Equation, InlineEquation
+from md2gost.lru_cache import LRUCache
 from md2gost.renderable.caption import CaptionInfo
 from md2gost.renderable.renderable import Renderable
 from md2gost.renderable_factory import RenderableFactory
@@ -16,26 +20,82 @@ from md2gost.renderable_factory import RenderableFactory
 from .parser import Parser
 
 
+MARKDOWN_BLOCK_CACHE_SIZE = 4096
+
+# parsed blocks of chunks of markdown by the hash of the chunk text
+block_cache = LRUCache("markdown blocks", MARKDOWN_BLOCK_CACHE_SIZE)
+
+_FENCE = re.compile(r" {0,3}(`{3,}|~{3,})")
+_LIST_ITEM = re.compile(r"([-+*]|\d{1,9}[.)])(\s|$)")
+_LINK_REFERENCE_DEFINITION = re.compile(r"^ {0,3}\[[^\]]+\]:", re.M)
+
+
+def split_chunks(text: str) -> list[str]:
+    """Splits the text into chunks of top-level blocks that are parsed the same way separately.
+
+    A chunk starts at a line that follows a blank line, is not indented and doesn't
+    continue a list, outside fenced code, equations and HTML comments. Link reference
+    definitions are used by the whole document, so such text is a single chunk."""
+    if _LINK_REFERENCE_DEFINITION.search(text):
+        return [text]
+
+    chunks = []
+    chunk_start = 0
+    pos = 0
+    fence = None
+    in_equation = False
+    in_comment = False
+    previous_blank = False
+    for line in text.splitlines(keepends=True):
+        if fence is None and not in_equation and not in_comment and previous_blank and pos > chunk_start \
+                and line[:1] not in ("", " ", "\t", "\n", "\r") and not _LIST_ITEM.match(line):
+            chunks.append(text[chunk_start:pos])
+            chunk_start = pos
+        pos += len(line)
+        previous_blank = not line.strip()
+
+        fence_match = _FENCE.match(line)
+        if fence is None and fence_match and not in_equation and not in_comment:
+            fence = fence_match.group(1)
+        elif fence is not None:
+            if fence_match and fence_match.group(1).startswith(fence) and not line.strip(" \r\n`~"):
+                fence = None
+        else:
+            in_equation ^= line.count("$$") % 2 == 1
+            opened, closed = line.rfind("<!--"), line.rfind("-->")
+            if opened != closed:
+                in_comment = opened > closed
+    chunks.append(text[chunk_start:])
+    return chunks
+
+
 class MarkdownParser(Parser):
     """Parses given markdown string and returns Renderable elements"""
 
     def __init__(self, document: Document):
         self._document = document
         self._factory = RenderableFactory(self._document._body)
+        self._dependencies: set[str] = set()
+
+    @property
+    def dependencies(self) -> set[str]:
+        return self._dependencies
 
     @staticmethod
-    def resolve_paths(marko_element: BlockElement, relative_dir_path: str):
-        """Resolves relative paths in Marko elements"""
+    def resolve_paths(marko_element: BlockElement, relative_dir_path: str) -> list[str]:
+        """Resolves relative paths in Marko elements, returns the paths of local files they include"""
+        paths = []
         if isinstance(marko_element, Paragraph):
             for child in marko_element.children:
                 if isinstance(child, Image) and\
                         not child.dest.startswith("http"):
                     child.dest = os.path.join(
                         relative_dir_path, os.path.expanduser(child.dest))
+                    paths.append(child.dest)
         if isinstance(marko_element, (CodeBlock, FencedCode))\
                 and marko_element.extra:
-            path = os.path.abspath(os.path.expanduser(os.path.join(
-                relative_dir_path, marko_element.extra.strip())))
+            path = MarkdownParser._code_file_path(marko_element, relative_dir_path)
+            paths.append(path)
 
             try:
                 with open(path, encoding="utf-8") as f:
@@ -44,13 +104,61 @@ class MarkdownParser(Parser):
             except FileNotFoundError:
                 logging.warning(
                     f"Файл с кодом не найден: {path}")
+        return paths
+
+    @staticmethod
+    def _code_file_path(marko_element: CodeBlock | FencedCode, relative_dir_path: str) -> str:
+        return os.path.abspath(os.path.expanduser(os.path.join(
+            relative_dir_path, marko_element.extra.strip())))
+
+    def listings(self, text: str, relative_dir_path: str) -> list[tuple[str, str]]:
+        listings = []
+        for marko_element in self._parse_blocks(text):
+            if not isinstance(marko_element, (CodeBlock, FencedCode)) or not marko_element.lang:
+                continue
+            code = marko_element.children[0].children
+            if marko_element.extra:
+                try:
+                    with open(self._code_file_path(marko_element, relative_dir_path), encoding="utf-8") as f:
+                        code += f.read()
+                except OSError:
+                    pass  # parse reports it
+            listings.append((code.removesuffix("\n"), marko_element.lang))
+        return listings
+
+    def formulas(self, text: str) -> list[str]:
+        return [marko_element.latex_equation for marko_element in self._elements(self._parse_blocks(text))
+                if isinstance(marko_element, (Equation, InlineEquation))]
+
+    def images(self, text: str) -> list[str]:
+        return [marko_element.dest for marko_element in self._elements(self._parse_blocks(text))
+                if isinstance(marko_element, Image) and marko_element.dest.startswith("http")]
+
+    @staticmethod
+    def _elements(marko_elements: list) -> Generator:
+        """Yields the elements and their descendants"""
+        for marko_element in marko_elements:
+            yield marko_element
+            if isinstance(getattr(marko_element, "children", None), list):
+                yield from MarkdownParser._elements(marko_element.children)
+
+    @staticmethod
+    def _parse_blocks(text: str) -> list[BlockElement]:
+        """Parses the text chunk by chunk, unchanged chunks are taken from the cache"""
+        blocks = []
+        for chunk in split_chunks(text):
+            chunk_blocks = block_cache.get_or_create(hashlib.sha1(chunk.encode()).digest(),
+                                                     lambda: markdown.parse(chunk).children)
+            # resolve_paths changes paragraphs and code blocks
+            blocks += [deepcopy(block) if isinstance(block, (Paragraph, CodeBlock, FencedCode)) else block
+                       for block in chunk_blocks]
+        return blocks
 
     def parse(self, text, relative_dir_path: str)\
             -> Generator[Renderable, None, None]:
-        marko_parsed = markdown.parse(text)
-        caption_info = CaptionInfo(uuid4().hex, None)
-        for marko_element in marko_parsed.children:
-            self.resolve_paths(marko_element, relative_dir_path)
+        caption_info = CaptionInfo(uuid4().hex, None, generated=True)
+        for marko_element in self._parse_blocks(text):
+            self._dependencies.update(self.resolve_paths(marko_element, relative_dir_path))
 
             if isinstance(marko_element, BlankLine):
                 continue
@@ -61,4 +169,4 @@ class MarkdownParser(Parser):
                 continue
 
             yield from self._factory.create(marko_element, caption_info)
-            caption_info = CaptionInfo(uuid4().hex, None)
+            caption_info = CaptionInfo(uuid4().hex, None, generated=True)
@@ -5,6 +5,23 @@ from md2gost.renderable import Renderable
 
 
 class Parser:
+    @property
+    def dependencies(self) -> set[str]:
+        """Paths of the local files included by the parsed text"""
+        return set()
+
+    def listings(self, text: str, relative_dir_path: str) -> list[tuple[str, str]]:
+        """Returns the code and the language of the listings with a language in the text"""
+        return []
+
+    def formulas(self, text: str) -> list[str]:
+        """Returns the LaTeX of the display and inline formulas in the text"""
+        return []
+
+    def images(self, text: str) -> list[str]:
+        """Returns the URLs of the remote images in the text"""
+        return []
+
     @abstractmethod
     def parse(self, text: str, relative_dir_path: str)\
             -> Generator[Renderable, None, None]:
@@ -8,9 +8,20 @@ from .processor import Processor
 
 
 class NumberingPreProcessor(Processor):
-    def __init__(self):
+    def __init__(self, warn_missing_references: bool = True):
         self._categories: dict[str, int] = defaultdict(lambda: 0)
-        self._reference_data: dict[str, int] = dict()
+        self._reference_data: dict[str, tuple[str, int]] = dict()
+        self._warn_missing_references = warn_missing_references
+
+    @property
+    def numbers(self) -> dict[str, int]:
+        """Numbers of numbered elements by category"""
+        return dict(self._categories)
+
+    @property
+    def references(self) -> dict[str, tuple[str, int]]:
+        """Categories and numbers of numbered elements by unique name"""
+        return dict(self._reference_data)
 
     def process(self, renderables: list[Renderable]):
         for obj in filter(lambda x: isinstance(x, (RequiresNumbering, List)), renderables):
@@ -29,11 +40,11 @@ class NumberingPreProcessor(Processor):
                 if requires_numbering.numbering_unique_name in self._reference_data:
                     logging.warning(f"Дублирование названия подписи: {requires_numbering.numbering_unique_name}. Ссылки будут созданы некорректно")
                 self._reference_data[requires_numbering.numbering_unique_name] =\
-                    self._categories[requires_numbering.numbering_category]
+                    requires_numbering.numbering_category, self._categories[requires_numbering.numbering_category]
 
         for paragraph in filter(lambda x: isinstance(x, Paragraph), renderables):
             for reference in paragraph.references:
                 if reference.unique_name in self._reference_data:
-                    reference.set_number(self._reference_data[reference.unique_name])
-                else:
+                    reference.set_number(self._reference_data[reference.unique_name][1])
+                elif self._warn_missing_references:
                     logging.warning(f"Неверная ссылка: {reference.unique_name} не существует")
@@ -1,57 +1,213 @@
+from collections.abc import Hashable
+from copy import copy
+from dataclasses import dataclass, replace
 from typing import TYPE_CHECKING
 
 from docx.document import Document
-from docx.shared import Length, Cm, Parented, Pt
+from docx.shared import Length, Parented
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph as DocxParagraph
+from lxml import etree
 
 from ..renderable import Renderable
 from ..util import create_element
-from ..layout_tracker import LayoutTracker
+from ..layout_tracker import LayoutTracker, LayoutState
+from ..rendered_info import RenderedInfo
 from . import Processor
 
 if TYPE_CHECKING:
     from ..debugger import Debugger
 
 
+@dataclass
+class Checkpoint:
+    """The layout after a renderable was rendered"""
+    fingerprint: Hashable | None
+    renderable: Renderable
+    infos: list[RenderedInfo]
+    layout_state: LayoutState
+    previous_rendered: RenderedInfo | None
+
+
+@dataclass
+class BlockLayout:
+    """Where a renderable is in the document"""
+    renderable: Renderable
+    start_page: int
+    end_page: int
+    y_offset: Length  # of the start from the top of the start page
+
+
+def _starts_new_page(info: RenderedInfo) -> bool:
+    """Returns whether the element starts on the next page: after a page break or pushed there as a whole"""
+    element = info.docx_element
+    return bool(info.skipped) or isinstance(element, DocxParagraph) and bool(element.paragraph_format.page_break_before)
+
+
+def _same(a: Hashable | None, b: Hashable | None) -> bool:
+    return a is not None and a == b
+
+
+def _previous_key(previous_rendered: RenderedInfo | None):
+    """Returns what the rendering of the next renderable depends on in the previous one"""
+    if previous_rendered is None:
+        return None
+    element = previous_rendered.docx_element
+    if not isinstance(element, DocxParagraph):
+        return type(element)
+    pPr = element._p.pPr
+    # exclusive canonicalization leaves out the namespaces of the document the element is in
+    return DocxParagraph, etree.tostring(pPr, method="c14n", exclusive=True) if pPr is not None else None, \
+        element.text == "\n"
+
+
 class Renderer(Processor):
-    """Renders Renderable elements to docx file"""
+    """Renders Renderable elements to docx file.
+
+    A checkpoint is recorded after each renderable. When the renderer processes a changed
+    list of renderables again, it keeps the output before the first changed renderable,
+    renders from there and stops as soon as the rest of the list is unchanged and the layout
+    is the same as in the previous rendering (the same position on the page after the same
+    previous element). The previous output of the rest is moved after the new output then.
 
-    def __init__(self, document: Document, layout_tracker: LayoutTracker, debugger: "Debugger | None" = None):
+    With layout_only, the renderables are laid out but nothing is added to the document."""
+
+    def __init__(self, document: Document, layout_tracker: LayoutTracker, debugger: "Debugger | None" = None,
+                 layout_only: bool = False):
         self._document: Document = document
         self._debugger = debugger
+        self._layout_only = layout_only
         self._layout_tracker = layout_tracker
+        self._initial_state = layout_tracker.current_state
+        self._checkpoints: list[Checkpoint] = []
+        # the body before the rendering, e.g. the title pages
+        self._initial_elements = set(self._document._body._element)
 
-        # add page numbering to the footer
+        # add page numbering to the footer, once for the document
         paragraph = self._document.sections[-1].footer.paragraphs[0]
-        paragraph.paragraph_format.first_line_indent = 0
-        paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-        paragraph._p.append(create_element("w:fldSimple", {
-            "w:instr": "PAGE \\* MERGEFORMAT"
-        }))
+        if not any(field.get(qn("w:instr"), "").startswith("PAGE")
+                   for field in paragraph._p.iterchildren(qn("w:fldSimple"))):
+            paragraph.paragraph_format.first_line_indent = 0
+            paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+            paragraph._p.append(create_element("w:fldSimple", {
+                "w:instr": "PAGE \\* MERGEFORMAT"
+            }))
 
         self.previous_rendered = None
 
     def process(self, renderables: list[Renderable]):
-        for i in range(len(renderables)):
-            self.render(renderables[i])
+        fingerprints = [renderable.fingerprint() for renderable in renderables]
+        old_checkpoints = self._checkpoints
+        old_fingerprints = [checkpoint.fingerprint for checkpoint in old_checkpoints]
+
+        # the debugger draws every rendered element, so everything is rendered again with it
+        start = 0
+        while not self._debugger and start < min(len(fingerprints), len(old_fingerprints)) \
+                and _same(fingerprints[start], old_fingerprints[start]):
+            start += 1
+        suffix = 0
+        while not self._debugger and suffix < min(len(fingerprints), len(old_fingerprints)) - start \
+                and _same(fingerprints[-1-suffix], old_fingerprints[-1-suffix]):
+            suffix += 1
+
+        self._checkpoints = [replace(checkpoint, renderable=renderable)
+                             for checkpoint, renderable in zip(old_checkpoints[:start], renderables)]
+        for checkpoint, renderable in zip(old_checkpoints[:start], renderables):
+            renderable.reuse(checkpoint.renderable, 0)
+        for checkpoint in old_checkpoints[start:]:
+            for info in checkpoint.infos:
+                if not self._layout_only:
+                    self._document._body._element.remove(info.docx_element._element)
+        self._restore(self._checkpoints[-1] if self._checkpoints else None)
+
+        # old_checkpoints[i+offset] is where renderables[i] was in the previous rendering,
+        # the layout may converge before anything is rendered if renderables were removed
+        offset = len(old_checkpoints) - len(renderables)
+        for i in range(start - 1, len(renderables)):
+            if i >= start:
+                infos = self.render(renderables[i])
+                self._checkpoints.append(Checkpoint(fingerprints[i], renderables[i], infos,
+                                                    self._layout_tracker.current_state, self.previous_rendered))
+
+            old_index = i + offset
+            if i + 1 >= len(renderables) - suffix and -1 <= old_index < len(old_checkpoints) - 1:
+                old_checkpoint = old_checkpoints[old_index] if old_index >= 0 else None
+                if self._converged(old_checkpoint):
+                    old_state = old_checkpoint.layout_state if old_checkpoint else self._initial_state
+                    self._splice(old_checkpoints[old_index+1:], renderables[i+1:],
+                                 self._layout_tracker.current_state.page - old_state.page)
+                    break
 
         if self._debugger:
             self._debugger.after_rendered()
 
-    def render(self, renderable: Renderable, flush=True):
-        infos = renderable.render(self.previous_rendered, self._layout_tracker.current_state)
+    def reset(self):
+        """Removes the output and the checkpoints, so the next process call renders everything.
+        A failed process call leaves the output half-updated, the renderer is reset after it"""
+        if not self._layout_only:
+            for element in list(self._document._body._element):
+                if element not in self._initial_elements:
+                    self._document._body._element.remove(element)
+        self._checkpoints = []
+        self._restore(None)
 
-        for info in infos:
+    def _restore(self, checkpoint: Checkpoint | None):
+        self._layout_tracker.restore(checkpoint.layout_state if checkpoint else self._initial_state)
+        self.previous_rendered = checkpoint.previous_rendered if checkpoint else None
+
+    def _converged(self, old_checkpoint: Checkpoint | None) -> bool:
+        """Returns whether the layout is the same as after the checkpoint of the previous rendering"""
+        state = self._layout_tracker.current_state
+        old_state = old_checkpoint.layout_state if old_checkpoint else self._initial_state
+        return state.current_page_height == old_state.current_page_height \
+            and _previous_key(self.previous_rendered) \
+            == _previous_key(old_checkpoint.previous_rendered if old_checkpoint else None)
+
+    def _splice(self, old_checkpoints: list[Checkpoint], renderables: list[Renderable], pages_delta: int):
+        """Moves the output of the checkpoints after the current output"""
+        for checkpoint, renderable in zip(old_checkpoints, renderables):
+            for info in checkpoint.infos:
+                if not self._layout_only:
+                    self._document._body._element.append(info.docx_element._element)
+            renderable.reuse(checkpoint.renderable, pages_delta)
+            layout_state = copy(checkpoint.layout_state)
+            layout_state.add_height(pages_delta * layout_state.max_height)
+            self._checkpoints.append(replace(checkpoint, renderable=renderable, layout_state=layout_state))
+        self._restore(self._checkpoints[-1])
+
+    def render(self, renderable: Renderable, flush=True) -> list[RenderedInfo]:
+        infos = []
+        for info in renderable.render(self.previous_rendered, self._layout_tracker.current_state):
             if isinstance(info, Renderable):
                 raise NotImplementedError()
             else:
                 self._add(info.docx_element, info.height)
                 self.previous_rendered = info
+                infos.append(info)
+        return infos
+
+    def block_layouts(self) -> list[BlockLayout]:
+        """Returns the positions of the renderables processed last"""
+        layouts = []
+        state = self._initial_state
+        for checkpoint in self._checkpoints:
+            if checkpoint.infos and _starts_new_page(checkpoint.infos[0]):
+                start_page, y_offset = state.page + 1, Length(0)
+            else:
+                start_page, y_offset = state.page, Length(state.current_page_height)
+            end_state = checkpoint.layout_state
+            # a block that ends at the bottom of a page doesn't end on the next one
+            end_page = end_state.page - 1 if end_state.current_page_height == 0 else end_state.page
+            layouts.append(BlockLayout(checkpoint.renderable, start_page, max(start_page, end_page), y_offset))
+            state = end_state
+        return layouts
 
     def _add(self, element: Parented, height: Length):
-        self._document._body._element.append(
-            element._element
-        )
+        if not self._layout_only:
+            self._document._body._element.append(
+                element._element
+            )
         self._layout_tracker.add_height(height)
 
         if self._debugger:
@@ -1,11 +1,26 @@
+import hashlib
+from collections import Counter
+
 from ...renderable import Renderable
 from ...renderable.heading import Heading
 from ...renderable.toc import ToC
 from .. import Processor
 
 
+def heading_anchor(level: int, text: str, occurrence: int) -> str:
+    # depends only on the heading, so headings keep their anchors when other text changes
+    return "_Toc" + hashlib.sha1(f"{level}|{text}|{occurrence}".encode()).hexdigest()[:16]
+
+
 class TocPreProcessor(Processor):
     def process(self, renderables: list[Renderable]):
+        occurrences = Counter()
+        for renderable in renderables:
+            if isinstance(renderable, Heading):
+                occurrences[renderable.level, renderable.text] += 1
+                renderable.anchor = heading_anchor(renderable.level, renderable.text,
+                                                   occurrences[renderable.level, renderable.text])
+
         renderables_iter = iter(renderables)
 
         toc = None
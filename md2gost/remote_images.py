@@ -0,0 +1,89 @@
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from typing import TYPE_CHECKING
+
+from .disk_cache import DiskCache
+from .lru_cache import LRUCache
+
+if TYPE_CHECKING:
+    import requests
+
+FETCH_THREADS = 8
+FETCH_TIMEOUT = (5, 30)  # seconds to connect and to wait for the data
+REMOTE_IMAGE_CACHE_SIZE = 128
+IMAGE_DISK_CACHE_SIZE = 256 * 1024 * 1024
+
+# contents of the images fetched in this run by the URL, None if the image can't be downloaded
+image_cache = LRUCache("remote images", REMOTE_IMAGE_CACHE_SIZE)
+# the validators (ETag, Last-Modified) and the contents of the images downloaded in the previous runs
+_image_disk_cache = DiskCache("images", IMAGE_DISK_CACHE_SIZE)
+
+_VALIDATORS = {"ETag": "If-None-Match", "Last-Modified": "If-Modified-Since"}
+
+
+@cache
+def _session(pid: int) -> "requests.Session":
+    """Returns the session of the process, forked processes don't share the connections"""
+    import requests  # slow to import, only documents with remote images need it
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=FETCH_THREADS, pool_maxsize=FETCH_THREADS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _pack(validators: dict[str, str], content: bytes) -> bytes:
+    return json.dumps(validators).encode() + b"\n" + content
+
+
+def _unpack(value: bytes) -> tuple[dict[str, str], bytes]:
+    validators, content = value.split(b"\n", 1)
+    return json.loads(validators), content
+
+
+def _download(url: str) -> bytes | None:
+    """Downloads the image, a saved copy is revalidated and used if the server can't be reached"""
+    import requests
+
+    saved = _image_disk_cache.get((url,))
+    validators, content = _unpack(saved) if saved is not None else ({}, None)
+    headers = {_VALIDATORS[name]: value for name, value in validators.items()}
+    try:
+        response = _session(os.getpid()).get(url, headers=headers, timeout=FETCH_TIMEOUT)
+        if response.status_code == 304 and content is not None:
+            return content
+        response.raise_for_status()
+    except requests.RequestException as e:
+        if content is not None:
+            logging.warning(f"Не удалось обновить картинку {url} ({e}), используется сохраненная копия")
+            return content
+        logging.warning(f"Не удалось загрузить картинку {url} ({e}), картинка не будет добавлена")
+        return None
+
+    validators = {name: response.headers[name] for name in _VALIDATORS if name in response.headers}
+    _image_disk_cache.put((url,), _pack(validators, response.content))
+    return response.content
+
+
+def fetch_images(urls: list[str]):
+    """Downloads the images that weren't fetched in this run concurrently, so remote_image
+    doesn't wait for the network. Images saved in the previous runs are revalidated"""
+    missing = [url for url in dict.fromkeys(urls) if url not in image_cache]
+    if not missing:
+        return
+
+    with ThreadPoolExecutor(min(FETCH_THREADS, len(missing))) as executor:
+        for url, content in zip(missing, executor.map(_download, missing)):
+            image_cache.put(url, content)
+
+
+def remote_image(url: str) -> bytes | None:
+    """Returns the content of the image or None if it can't be downloaded. Images that
+    fetch_images didn't fetch are taken from the disk cache as they are or downloaded"""
+    if url not in image_cache:
+        saved = _image_disk_cache.get((url,))
+        image_cache.put(url, _unpack(saved)[1] if saved is not None else _download(url))
+    return image_cache.get(url)
@@ -0,0 +1,141 @@
+from functools import cache
+from typing import TYPE_CHECKING
+from weakref import WeakKeyDictionary
+
+from docx.shared import Pt
+from uniseg.linebreak import line_break
+
+from .glyph_table import DENSE_CODEPOINTS, needs_shaping
+
+if TYPE_CHECKING:
+    from .paragraph_sizer import Font, ParagraphSizer
+
+# a separately measured piece of text is rounded to whole pixels at its start, pen positions and end
+_PIECE_SLACK = 3 * 63
+# line breaks are never allowed between two of these
+_NO_BREAK_CLASSES = {"AL", "NU", "AI"}
+
+_font_metrics: "WeakKeyDictionary[Font, tuple | None]" = WeakKeyDictionary()
+
+
+def _get_font_metrics(font: "Font"):
+    """Returns glyph indices, advances and ink overhangs of the dense codepoints as numpy arrays,
+    or None if the font is measured by PIL"""
+    import numpy as np
+
+    if font in _font_metrics:
+        return _font_metrics[font]
+
+    if font.is_mono:
+        metrics = (np.zeros(DENSE_CODEPOINTS, np.int64),
+                   np.full(DENSE_CODEPOINTS, font._mono_advance, np.int64),
+                   np.zeros(DENSE_CODEPOINTS, np.int64))
+    elif font.glyph_table:
+        indices, advances, lefts, rights = (np.array(values, np.int64) for values in font.glyph_table.dense_glyphs())
+        metrics = (indices, advances, np.maximum(rights - advances, 0) + np.maximum(-lefts, 0))
+    else:
+        metrics = None
+    _font_metrics[font] = metrics
+    return metrics
+
+
+@cache
+def _char_tables():
+    import numpy as np
+
+    chars = [chr(code) for code in range(DENSE_CODEPOINTS)]
+    no_break = np.array([line_break(char) in _NO_BREAK_CLASSES for char in chars])
+    spaces = np.array([char.isspace() for char in chars])
+    shaping = np.array([needs_shaping(char) for char in chars])
+    return no_break, spaces, shaping
+
+
+def fit_single_lines(sizers: list["ParagraphSizer"]) -> list[bool]:
+    """Returns for each sizer whether its paragraph surely fits one line.
+
+    The width of every paragraph is bounded from above in one vectorized pass over the batch:
+    advances are summed, and each piece of text that split_lines may measure separately
+    (a line break unit or a part of it in another run) gets the largest rounding and
+    ink overhang slack. A paragraph that fits with the bound fits when it's measured exactly.
+    Paragraphs that can't be bounded (fonts without glyph tables, scripts that need shaping)
+    are reported as not fitting."""
+    import numpy as np
+
+    fits = [False] * len(sizers)
+    fonts: dict["Font", int] = {}
+    batch = []  # indices of the sizers in the arrays
+    texts, span_lengths, span_fonts, space_widths, budgets = [], [], [], [], []
+    for i, sizer in enumerate(sizers):
+        text, span_ends, span_font_list = sizer._spans
+        if not text:
+            fits[i] = True
+            continue
+        batch.append(i)
+        texts.append(text)
+        start = 0
+        for end, font in zip(span_ends, span_font_list):
+            if end > start:
+                span_lengths.append(end - start)
+                span_fonts.append(fonts.setdefault(font, len(fonts)))
+            start = end
+        space_width = sizer.font.get_text_width(" ")
+        if not sizer.font.is_mono:
+            space_width *= 0.825
+        space_widths.append(space_width)
+        budgets.append(sizer.max_width - ((sizer.paragraph_format.first_line_indent or 0) + sizer._tabs_size))
+    if not batch:
+        return fits
+
+    metrics = [_get_font_metrics(font) for font in fonts]
+    empty = (np.zeros(DENSE_CODEPOINTS, np.int64),) * 3
+    indices_table, advances_table, overhangs_table = (np.stack([(m or empty)[k] for m in metrics]) for k in range(3))
+    unsupported_fonts = np.array([m is None for m in metrics])
+    kerning_fonts = np.array([m is not None and not font.is_mono and font.glyph_table._has_kerning
+                              for font, m in zip(fonts, metrics)])
+    no_break, spaces, shaping = _char_tables()
+
+    lengths = np.array([len(text) for text in texts])
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), np.uint32).astype(np.int64)
+    dense_codes = np.minimum(codes, DENSE_CODEPOINTS - 1)
+    paragraph_ids = np.repeat(np.arange(len(texts)), lengths)
+    font_ids = np.repeat(np.array(span_fonts), np.array(span_lengths))
+    span_starts = np.zeros(len(codes), bool)
+    span_starts[np.cumsum(span_lengths)[:-1]] = True
+
+    # the width of a tab depends on its position in monospace paragraphs
+    unsupported = (codes >= DENSE_CODEPOINTS) | shaping[dense_codes] | unsupported_fonts[font_ids] | (codes == 0x09)
+
+    glyphs = indices_table[font_ids, dense_codes]
+    widths = advances_table[font_ids, dense_codes].astype(float)
+    is_space = spaces[dense_codes]
+    # trailing spaces are counted with the space width, others with their advance
+    space_widths_units = np.array(space_widths, float) / Pt(1) * 64
+    widths[is_space] = np.maximum(widths[is_space], space_widths_units[paragraph_ids[is_space]])
+
+    # kerning inside a run, each distinct pair is looked up once
+    pairs = (paragraph_ids[1:] == paragraph_ids[:-1]) & (font_ids[1:] == font_ids[:-1]) \
+        & kerning_fonts[font_ids[1:]] & (glyphs[1:] > 0) & (glyphs[:-1] > 0) & ~unsupported[1:] & ~unsupported[:-1]
+    pair_positions = np.nonzero(pairs)[0] + 1
+    if len(pair_positions):
+        keys = font_ids[pair_positions] << 42 | glyphs[pair_positions - 1] << 21 | glyphs[pair_positions]
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        font_list = list(fonts)
+        kernings = np.array([abs(font_list[key >> 42].glyph_table.kerning(key >> 21 & 0x1FFFFF, key & 0x1FFFFF))
+                             for key in unique_keys.tolist()], float)
+        np.add.at(widths, pair_positions, kernings[inverse])
+
+    # a piece starts at every possible line break and at every run start
+    piece_starts = span_starts.copy()
+    piece_starts[1:] |= (codes[1:] != 0x20) & ~(no_break[dense_codes[1:]] & no_break[dense_codes[:-1]])
+    piece_starts[starts] = True
+
+    overhangs = overhangs_table[font_ids, dense_codes]
+    bounds = (np.add.reduceat(widths, starts)
+              + np.add.reduceat(piece_starts, starts) * (np.maximum.reduceat(overhangs, starts) + _PIECE_SLACK)) \
+        / 64 * Pt(1)
+    batch_fits = (np.add.reduceat(unsupported, starts) == 0) & (bounds + 1 <= np.array(budgets, float))
+
+    for i, fit in zip(batch, batch_fits.tolist()):
+        fits[i] = fit
+    return fits
@@ -19,6 +19,12 @@ from ..util import create_element
 class CaptionInfo:
     unique_name: str
     text: str | None
+    generated: bool = False  # the unique name is not from the markdown
+
+    def key(self) -> tuple:
+        """Returns the caption as a part of a fingerprint, generated names are left out
+        as nothing but the captioned element refers to them"""
+        return None if self.generated else self.unique_name, self.text
 
 
 class Caption(Renderable):
@@ -3,7 +3,7 @@ from uuid import uuid4
 
 from docx.enum.table import WD_CELL_VERTICAL_ALIGNMENT
 from docx.oxml import CT_Tbl
-from docx.shared import Pt, Twips
+from docx.shared import Length, Pt, Twips
 from docx.table import Table
 
 from .caption import CaptionInfo
@@ -21,6 +21,8 @@ _HEIGHT = Pt(50)
 class Equation(Renderable, RequiresNumbering):
     def __init__(self, parent, latex_formula: str, caption_info: CaptionInfo):
         super().__init__("Формула", caption_info.unique_name if caption_info else None)
+        self._latex_formula = latex_formula
+        self._caption_info = caption_info
         word_math = latex_to_omml(latex_formula)
 
         sect = parent.part.document.sections[-1]
@@ -72,11 +74,17 @@ class Equation(Renderable, RequiresNumbering):
     def set_number(self, number: int):
         self._numbering_run.text = str(number)
 
+    def fingerprint(self):
+        return (self._latex_formula, self._numbering_run.text,
+                self._caption_info.key() if self._caption_info else None)
+
     def render(self, previous_rendered: RenderedInfo, layout_state: LayoutState) -> Generator[
             "RenderedInfo | Renderable", None, None]:
         height = _HEIGHT
+        skipped = 0
 
         if height > layout_state.remaining_page_height:
-            height += layout_state.remaining_page_height
+            skipped = layout_state.remaining_page_height
+            height += skipped
 
-        yield RenderedInfo(self._table, height)
+        yield RenderedInfo(self._table, height, Length(skipped))
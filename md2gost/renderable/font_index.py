@@ -0,0 +1,193 @@
+import glob
+import json
+import logging
+import os
+from xml.etree import ElementTree
+
+from freetype import Face, FT_STYLE_FLAG_BOLD, FT_STYLE_FLAG_ITALIC
+
+from ..util import get_cache_dir
+
+INDEX_VERSION = 1
+FONTCONFIG_PATH = "/etc/fonts/fonts.conf"
+DEFAULT_FONT_DIRS = ["/usr/share/fonts", "/usr/local/share/fonts", "~/.local/share/fonts", "~/.fonts"]
+FONT_EXTENSIONS = (".ttf", ".ttc", ".otf", ".otc")
+
+# style names that are preferred over e.g. "Condensed" or "Light" with the same flags
+_PLAIN_STYLES = {"regular", "normal", "roman", "book", "bold", "italic", "oblique",
+                 "bold italic", "bold oblique"}
+
+
+def _expand_dir(path: str, prefix: str | None, config_dir: str) -> str:
+    if prefix == "xdg":
+        path = os.path.join(os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share"), path)
+    elif prefix == "relative" or (not os.path.isabs(path) and not path.startswith("~")):
+        path = os.path.join(config_dir, path)
+    return os.path.abspath(os.path.expanduser(path))
+
+
+def fontconfig_dirs(config_path: str = FONTCONFIG_PATH) -> list[str]:
+    """Returns font directories listed in the fontconfig configuration"""
+    config_files = [config_path] + sorted(glob.glob(os.path.join(os.path.dirname(config_path), "conf.d", "*.conf")))
+    dirs = []
+    for config_file in config_files:
+        try:
+            root = ElementTree.parse(config_file).getroot()
+        except (OSError, ElementTree.ParseError):
+            continue
+        for element in root.iter("dir"):
+            if element.text:
+                dirs.append(_expand_dir(element.text.strip(), element.get("prefix"), os.path.dirname(config_file)))
+    if not dirs:
+        dirs = [os.path.abspath(os.path.expanduser(path)) for path in DEFAULT_FONT_DIRS]
+    return list(dict.fromkeys(dirs))
+
+
+def split_face_path(path: str) -> tuple[str, int]:
+    """Returns the font file and the index of the face in it, faces of font collections
+    are found as path#index"""
+    file_path, separator, face_index = path.rpartition("#")
+    if separator and face_index.isdigit() and file_path.lower().endswith((".ttc", ".otc")):
+        return file_path, int(face_index)
+    return path, 0
+
+
+def _face_families(face: Face) -> list[str]:
+    """Returns all (including localized) family names of the face"""
+    families = [face.family_name.decode(errors="replace")] if face.family_name else []
+    for i in range(face.sfnt_name_count):
+        name = face.get_sfnt_name(i)
+        if name.name_id not in (1, 16):  # font family and typographic family
+            continue
+        try:
+            if name.platform_id in (0, 3):
+                families.append(name.string.decode("utf-16-be"))
+            elif name.platform_id == 1 and name.encoding_id == 0:
+                families.append(name.string.decode("mac-roman"))
+        except UnicodeDecodeError:
+            pass
+    return list(dict.fromkeys(family.strip() for family in families if family.strip()))
+
+
+class FontIndex:
+    """Maps font families and styles to font files.
+
+    The index is built by scanning the font directories with freetype and is stored
+    on disk. It is loaded lazily and rebuilt when a font directory changes."""
+
+    def __init__(self, dirs: list[str], index_path: str | None):
+        self._dirs = dirs
+        self._index_path = index_path
+        self._fonts: list[tuple[str, list[str], str, bool, bool]] | None = None
+        self._by_family: dict[tuple[str, bool, bool], str] = {}
+
+    def _scan_dirs(self) -> dict[str, float]:
+        mtimes = {}
+        for root_dir in self._dirs:
+            for dir_path, _, _ in os.walk(root_dir):
+                try:
+                    mtimes[dir_path] = os.stat(dir_path).st_mtime
+                except OSError:
+                    pass
+        return mtimes
+
+    def _is_up_to_date(self, index: dict) -> bool:
+        if index.get("version") != INDEX_VERSION or index.get("dirs_config") != self._dirs:
+            return False
+        for dir_path, mtime in index["dirs"].items():
+            try:
+                if os.stat(dir_path).st_mtime != mtime:
+                    return False
+            except OSError:
+                return False
+        # a new subdirectory changes the mtime of its parent, so only new roots are left
+        return all(not os.path.isdir(root_dir) or root_dir in index["dirs"] for root_dir in self._dirs)
+
+    def _read(self) -> dict | None:
+        if not self._index_path:
+            return None
+        try:
+            with open(self._index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, index: dict):
+        if not self._index_path:
+            return
+        try:
+            tmp_path = f"{self._index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(index, f, ensure_ascii=False)
+            os.replace(tmp_path, self._index_path)
+        except OSError as e:
+            logging.warning(f"Не удалось сохранить индекс шрифтов: {e}")
+
+    def rebuild(self) -> int:
+        """Scans the font directories and saves the index, returns the number of faces"""
+        dirs = self._scan_dirs()
+        fonts = []
+        for dir_path in dirs:
+            for file_name in sorted(os.listdir(dir_path)):
+                path = os.path.join(dir_path, file_name)
+                if not file_name.lower().endswith(FONT_EXTENSIONS) or not os.path.isfile(path):
+                    continue
+                face_index, num_faces = 0, 1
+                while face_index < num_faces:
+                    try:
+                        face = Face(path, face_index)
+                    except Exception:
+                        logging.debug(f"Не удалось прочитать шрифт {path}")
+                        break
+                    num_faces = face.num_faces
+                    fonts.append((path if num_faces == 1 else f"{path}#{face_index}",
+                                  _face_families(face),
+                                  (face.style_name or b"").decode(errors="replace"),
+                                  bool(face.style_flags & FT_STYLE_FLAG_BOLD),
+                                  bool(face.style_flags & FT_STYLE_FLAG_ITALIC)))
+                    face_index += 1
+
+        self._write({"version": INDEX_VERSION, "dirs_config": self._dirs, "dirs": dirs, "fonts": fonts})
+        self._set_fonts(fonts)
+        return len(fonts)
+
+    def _set_fonts(self, fonts: list):
+        self._fonts = [tuple(font) for font in fonts]
+        self._by_family = {}
+        # plain styles go first so they win over e.g. "Condensed Bold" of the same family
+        for path, families, style_name, bold, italic in sorted(
+                self._fonts, key=lambda font: font[2].lower() not in _PLAIN_STYLES):
+            for family in families:
+                self._by_family.setdefault((family.lower(), bold, italic), path)
+
+    def _load(self):
+        index = self._read()
+        if index and self._is_up_to_date(index):
+            self._set_fonts(index["fonts"])
+        else:
+            self.rebuild()
+
+    def find(self, name: str, bold: bool, italic: bool) -> str | None:
+        if self._fonts is None:
+            self._load()
+
+        path = self._by_family.get((name.lower(), bool(bold), bool(italic)))
+        if path:
+            return path
+
+        # fall back to partial family names like "Times" for "Times New Roman"
+        for path, families, _, font_bold, font_italic in self._fonts:
+            if font_bold == bool(bold) and font_italic == bool(italic)\
+                    and any(name in family for family in families):
+                return path
+        return None
+
+
+_font_index: FontIndex | None = None
+
+
+def get_font_index() -> FontIndex:
+    global _font_index
+    if _font_index is None:
+        _font_index = FontIndex(fontconfig_dirs(), os.path.join(get_cache_dir(), "font_index.json"))
+    return _font_index
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+from array import array
+
+import PIL
+from PIL import features
+
+from .glyph_table import DENSE_CODEPOINTS
+from ..util import get_cache_dir
+
+METRICS_VERSION = 1
+_MAGIC = b"MD2GOSTFM"
+_HEADER = struct.Struct("<9sII")  # magic, version, length of the json part
+
+
+class FontMetrics:
+    """Metrics of a font file at a size that are kept between runs.
+
+    values holds scalar metrics (line height, advances, flags), glyphs the state of the
+    glyph table. Metrics are stored in the cache directory, one file per font face and size,
+    and are found by the path, size and modification time of the font file, so a changed
+    font file gets new metrics. The dense glyph arrays are memory-mapped when loaded."""
+
+    def __init__(self, font_path: str, size_pt: float, face_index: int = 0):
+        self.values: dict = {}
+        self.glyphs: tuple | None = None
+        self.path = _metrics_path(font_path, size_pt, face_index)
+        if self.path:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                # a private mapping, so glyphs loaded later don't change the file
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (OSError, ValueError):
+            return
+        try:
+            magic, version, json_size = _HEADER.unpack_from(data)
+            if magic != _MAGIC or version != METRICS_VERSION:
+                return
+            state = json.loads(bytes(data[_HEADER.size:_HEADER.size + json_size]))
+            start = _dense_offset(json_size)
+            arrays = memoryview(data)[start:start + 4 * 4 * DENSE_CODEPOINTS].cast("i")
+            if len(arrays) != 4 * DENSE_CODEPOINTS:
+                return
+        except (struct.error, ValueError, TypeError):
+            logging.debug(f"Не удалось прочитать метрики шрифта {self.path}")
+            return
+        self.values = state["values"]
+        if state["glyphs"]:
+            sparse, kerning = state["glyphs"]
+            self.glyphs = (tuple(arrays[i * DENSE_CODEPOINTS:(i + 1) * DENSE_CODEPOINTS] for i in range(4)),
+                           {code: tuple(glyph) for code, *glyph in sparse},
+                           dict(kerning))
+
+    def save(self, values: dict, glyphs: tuple | None):
+        """Saves the values and the glyph table state (dense arrays, sparse glyphs, kerning pairs)"""
+        if not self.path:
+            return
+        json_part = json.dumps({
+            "values": values,
+            "glyphs": [[[code, *glyph] for code, glyph in glyphs[1].items()], list(glyphs[2].items())]
+            if glyphs else None
+        }).encode()
+        dense = array("i")
+        for glyph_values in (glyphs[0] if glyphs else [array("i", [0]) * DENSE_CODEPOINTS] * 4):
+            dense.extend(glyph_values)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(_HEADER.pack(_MAGIC, METRICS_VERSION, len(json_part)))
+                f.write(json_part)
+                f.write(b"\0" * (_dense_offset(len(json_part)) - _HEADER.size - len(json_part)))
+                f.write(dense.tobytes())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Не удалось сохранить метрики шрифта: {e}")
+
+
+def _dense_offset(json_size: int) -> int:
+    # arrays are aligned to their item size
+    return (_HEADER.size + json_size + 3) & ~3
+
+
+def _metrics_path(font_path: str, size_pt: float, face_index: int) -> str | None:
+    try:
+        stat = os.stat(font_path)
+    except OSError:
+        return None
+    # whether the glyph table matches PIL depends on the PIL build
+    key = f"{METRICS_VERSION}|{os.path.abspath(font_path)}|{face_index}|{stat.st_size}|{stat.st_mtime_ns}|" \
+          f"{size_pt}|{PIL.__version__}|{features.check_feature('raqm')}"
+    return os.path.join(get_cache_dir(), "font_metrics", hashlib.sha1(key.encode()).hexdigest() + ".bin")
@@ -0,0 +1,124 @@
+import unicodedata
+from array import array
+from collections.abc import Callable, Sequence
+from functools import cache
+
+from freetype import Face, FT_LOAD_DEFAULT, FT_LOAD_NO_BITMAP, FT_KERNING_DEFAULT
+
+# codepoints below this are kept in flat arrays (Basic Latin .. Cyrillic Supplement),
+# the rest go to a dict
+DENSE_CODEPOINTS = 0x530
+
+_MISSING = -1 << 30
+_LOAD_FLAGS = FT_LOAD_DEFAULT | FT_LOAD_NO_BITMAP
+
+
+@cache
+def needs_shaping(char: str) -> bool:
+    """Returns True if the character can't be measured glyph by glyph"""
+    code = ord(char)
+    if code < 0x300:
+        return char in "\n\r\x0b\x0c"
+    return bool(unicodedata.combining(char)) \
+        or unicodedata.bidirectional(char) in ("R", "AL", "AN", "NSM") \
+        or 0x0900 <= code < 0x1100 \
+        or 0x1780 <= code < 0x18B0 \
+        or code in (0x200C, 0x200D, 0x2028, 0x2029) \
+        or unicodedata.category(char) in ("Cs", "Co")
+
+
+class GlyphTable:
+    """Per-codepoint advances, ink extents and kerning pairs of a face at a fixed size.
+
+    Glyph metrics are read from the face once and kept in flat arrays, so measuring
+    a string is a lookup and a sum. The result reproduces ImageDraw.textbbox
+    with the basic layout engine, all values are in 26.6 pixels.
+
+    The face is requested from get_face only for glyphs and pairs that aren't known yet,
+    so a table restored from saved metrics doesn't open the font file."""
+
+    def __init__(self, get_face: Callable[[], Face], has_kerning: bool,
+                 dense: tuple[Sequence[int], Sequence[int], Sequence[int], Sequence[int]] | None = None,
+                 sparse: dict[int, tuple[int, int, int, int]] | None = None, kerning: dict[int, int] | None = None):
+        self._get_face = get_face
+        self._has_kerning = has_kerning
+        self.changed = dense is None
+
+        self._indices, self._advances, self._lefts, self._rights = dense or (
+            array("i", [_MISSING]) * DENSE_CODEPOINTS, array("i", [0]) * DENSE_CODEPOINTS,
+            array("i", [0]) * DENSE_CODEPOINTS, array("i", [0]) * DENSE_CODEPOINTS)
+        self._sparse: dict[int, tuple[int, int, int, int]] = sparse or {}
+        self._kerning: dict[int, int] = kerning or {}
+
+    @classmethod
+    def from_face(cls, face: Face) -> "GlyphTable":
+        return cls(lambda: face, face.has_kerning)
+
+    def _load(self, code: int) -> tuple[int, int, int, int]:
+        face = self._get_face()
+        index = face.get_char_index(code)
+        face.load_glyph(index, _LOAD_FLAGS)
+        metrics = face.glyph.metrics
+        # ink box is snapped to the pixel grid like PIL does
+        left = (metrics.horiBearingX >> 6) << 6
+        right = -((-(metrics.horiBearingX + metrics.width)) >> 6) << 6
+        glyph = (index, metrics.horiAdvance, left, right)
+
+        if code < DENSE_CODEPOINTS:
+            self._indices[code], self._advances[code], self._lefts[code], self._rights[code] = glyph
+        else:
+            self._sparse[code] = glyph
+        self.changed = True
+        return glyph
+
+    def glyph(self, code: int) -> tuple[int, int, int, int]:
+        """Returns (glyph index, advance, ink left, ink right) of the codepoint"""
+        if code < DENSE_CODEPOINTS:
+            if self._indices[code] == _MISSING:
+                return self._load(code)
+            return self._indices[code], self._advances[code], self._lefts[code], self._rights[code]
+        glyph = self._sparse.get(code)
+        return glyph if glyph else self._load(code)
+
+    def dense_glyphs(self) -> tuple[Sequence[int], Sequence[int], Sequence[int], Sequence[int]]:
+        """Returns glyph indices, advances, ink lefts and rights of all codepoints below DENSE_CODEPOINTS"""
+        for code in range(DENSE_CODEPOINTS):
+            if self._indices[code] == _MISSING:
+                self._load(code)
+        return self._indices, self._advances, self._lefts, self._rights
+
+    def kerning(self, left_index: int, right_index: int) -> int:
+        if not (self._has_kerning and left_index and right_index):
+            return 0
+        key = left_index << 32 | right_index
+        value = self._kerning.get(key)
+        if value is None:
+            delta = self._get_face().get_kerning(left_index, right_index, FT_KERNING_DEFAULT).x
+            # PIL adds the kerning rounded up to whole pixels, but in 26.6 units
+            value = self._kerning[key] = (delta + 63) >> 6
+            self.changed = True
+        return value
+
+    def state(self) -> tuple[tuple[Sequence[int], ...], dict[int, tuple[int, int, int, int]], dict[int, int]]:
+        """Returns the dense arrays, the sparse glyphs and the kerning pairs
+        to restore the table with, all dense glyphs are loaded first"""
+        return self.dense_glyphs(), self._sparse, self._kerning
+
+    def text_width(self, text: str) -> int | None:
+        """Returns the width of the text in pixels or None if the text needs shaping"""
+        x = x_min = x_max = 0
+        previous = 0
+        for char in text:
+            code = ord(char)
+            if (code < 0x20 or code >= 0x300) and needs_shaping(char):
+                return None
+            index, advance, left, right = self.glyph(code)
+            if previous:
+                x += self.kerning(previous, index)
+            pen = (x + 63) & ~63
+            x_min = min(x_min, pen + left)
+            x_max = max(x_max, pen + right)
+            x += advance
+            previous = index
+        x_max = max(x_max, x)
+        return ((x_max + 63) >> 6) - (x_min >> 6)
@@ -3,7 +3,9 @@ from typing import Generator
 from uuid import uuid4
 
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.oxml.ns import qn
 from docx.text.paragraph import Paragraph as DocxParagraph
+from docx.text.run import Run
 from docx.shared import Parented, Length, Cm
 
 from . import Renderable
@@ -36,18 +38,27 @@ class Heading(Paragraph):
         self._id = uuid4().hex
 
         # todo: add bookmark here
-        self._docx_paragraph._p.append(create_element("w:bookmarkStart", {
+        self._bookmark_start = create_element("w:bookmarkStart", {
             "w:id": self._id,
             "w:name": self._id,
-        }))
-        self._docx_paragraph._p.append(create_element("w:bookmarkEnd", {
+        })
+        self._bookmark_end = create_element("w:bookmarkEnd", {
             "w:id": self._id,
-        }))
+        })
+        self._docx_paragraph._p.append(self._bookmark_start)
+        self._docx_paragraph._p.append(self._bookmark_end)
 
     @property
     def anchor(self) -> str:
         return self._id
 
+    @anchor.setter
+    def anchor(self, value: str):
+        self._id = value
+        self._bookmark_start.set(qn("w:id"), value)
+        self._bookmark_start.set(qn("w:name"), value)
+        self._bookmark_end.set(qn("w:id"), value)
+
     @property
     def is_numbered(self) -> bool:
         return self._numbered
@@ -62,7 +73,13 @@ class Heading(Paragraph):
 
     @property
     def text(self) -> str:
-        return self._docx_paragraph.text
+        """Returns the text of the heading with its inline formulas"""
+        return "".join("".join(element.itertext()) if element.tag == qn("m:oMath")
+                       else Run(element, self._docx_paragraph).text
+                       for element in self._docx_paragraph._p.iterchildren(qn("w:r"), qn("m:oMath")))
+
+    def reuse(self, rendered: "Heading", pages_delta: int):
+        self._rendered_page = rendered.rendered_page + pages_delta
 
     def _remove_numbering(self):
         self._docx_paragraph._p.pPr.append(
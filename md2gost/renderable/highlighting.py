@@ -0,0 +1,66 @@
+from functools import cache
+from typing import Callable
+
+import docx
+from docx.document import Document
+from docx.oxml.ns import qn
+from docx.shared import RGBColor
+from lxml import etree
+from pygments import highlight
+from pygments.formatter import Formatter
+from pygments.lexers import get_lexer_by_name
+from pygments.util import ClassNotFound
+
+from .listing import HIGHLIGHTING_STYLE
+from .paragraph import Paragraph
+from ..util import create_element
+
+
+def lexer_name(language: str) -> str | None:
+    """Returns the name of the lexer for the language, None if it is not supported"""
+    try:
+        return get_lexer_by_name(language).name
+    except ClassNotFound:
+        return None
+
+
+@cache
+def _highlighting_document() -> Document:
+    return docx.Document()
+
+
+def highlight_runs(text: str, language: str) -> bytes:
+    """Returns the highlighted lines as w:p elements with the runs in a w:body,
+    runs in worker processes too"""
+    parent = _highlighting_document()._body
+    paragraphs = []
+    highlight(text, get_lexer_by_name(language),
+              DocxParagraphPygmentsFormatter(paragraphs, lambda: Paragraph(parent)))
+    return etree.tostring(create_element("w:body", [
+        create_element("w:p", list(paragraph._docx_paragraph._p.iterchildren(qn("w:r"))))
+        for paragraph in paragraphs
+    ]))
+
+
+class DocxParagraphPygmentsFormatter(Formatter):
+    def __init__(self, paragraphs: list[Paragraph], creator: Callable[[], Paragraph], **options):
+        Formatter.__init__(self, style=HIGHLIGHTING_STYLE, **options)
+        self._creator = creator
+        self._paragraphs = paragraphs
+        # add_run arguments by the token type, runs with the same arguments share the run properties
+        self._run_arguments = {}
+
+        for token, style in self.style:
+            self._run_arguments[token] = (style["bold"] or None, style["italic"] in style or None,
+                                          RGBColor.from_string(style['color']) if style['color'] else None)
+
+    def format(self, tokensource, outfile):
+        self._paragraphs.append(self._creator())
+        for ttype, value in tokensource:
+            run_arguments = self._run_arguments[ttype]
+            lines = iter(value.split("\n"))
+            self._paragraphs[-1].add_run(next(lines), *run_arguments)
+            for line in lines:
+                self._paragraphs.append(self._creator())
+                self._paragraphs[-1].add_run(line, *run_arguments)
+        self._paragraphs.pop(-1)  # remove last empty line
@@ -5,7 +5,6 @@ from typing import Generator
 from os import environ
 import os.path
 
-import requests
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from docx.shared import Parented, Length
 from docx.text.paragraph import Paragraph
@@ -14,6 +13,7 @@ from .caption import Caption, CaptionInfo
 from .renderable import Renderable
 from .requires_numbering import RequiresNumbering
 from ..layout_tracker import LayoutState
+from ..remote_images import remote_image
 from ..rendered_info import RenderedInfo
 from ..util import create_element
 
@@ -23,6 +23,7 @@ class Image(Renderable, RequiresNumbering):
         super().__init__("Рисунок", caption_info.unique_name if caption_info else None)
         self._parent = parent
         self._caption_info = caption_info
+        self._path = path
         self._docx_paragraph = Paragraph(create_element("w:p"), parent)
         self._docx_paragraph.paragraph_format.space_before = 0
         self._docx_paragraph.paragraph_format.space_after = 0
@@ -34,9 +35,11 @@ class Image(Renderable, RequiresNumbering):
         run = self._docx_paragraph.add_run()
 
         if path.startswith("http"):
-            bytesio = BytesIO()
-            bytesio.write(requests.get(path).content)
-            self._image = run.add_picture(bytesio)
+            content = remote_image(path)
+            if content is not None:
+                self._image = run.add_picture(BytesIO(content))
+            else:
+                self._invalid = True
         else:
             try:
                 self._image = run.add_picture(path)
@@ -49,6 +52,14 @@ class Image(Renderable, RequiresNumbering):
     def set_number(self, number: int):
         self._number = number
 
+    def fingerprint(self):
+        if self._invalid:
+            return self._path, self._number
+        # images with the same content share the relationship
+        return (self._path, self._number, self._caption_info.key() if self._caption_info else None,
+                self._image._inline.graphic.graphicData.pic.blipFill.blip.embed,
+                self._image.width, self._image.height)
+
     def resize(self, width: Length = None, height: Length = None):
         if not any((width, height)):
             return
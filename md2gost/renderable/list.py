@@ -46,6 +46,10 @@ class List(Renderable):
         self._items += images
         return paragraph
 
+    def fingerprint(self):
+        fingerprints = tuple(item.fingerprint() for item in self._items)
+        return None if None in fingerprints else fingerprints
+
     def get_images(self) -> list[Image]:
         return [x for x in self._items if isinstance(x, Image)]
 
@@ -1,48 +1,59 @@
+import hashlib
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from copy import copy
 import os
-from typing import Generator, Callable
+from typing import Generator
 
-from docx.shared import Length, Pt, RGBColor, Twips
-
-from pygments import highlight
-from pygments.formatter import Formatter
-from pygments.lexers import get_lexer_by_name
-from pygments.util import ClassNotFound
+from docx.oxml import parse_xml
+from docx.shared import Length, Pt, Twips
 
 from .caption import Caption, CaptionInfo
 from .paragraph import Paragraph, Reference
+from .paragraph_sizer import ParagraphSizer, MEASURE_BATCH_SIZE
 from .renderable import Renderable
 from .requires_numbering import RequiresNumbering
+from ..disk_cache import DiskCache
 from ..docx_elements import create_table
 from ..layout_tracker import LayoutState
 from ..rendered_info import RenderedInfo
 
+HIGHLIGHTING_STYLE = "sas"
+HIGHLIGHTING_CACHE_SIZE = 64 * 1024 * 1024
+
+# runs of the highlighted listings by the lexer, the style and the text
+_highlighting_cache = DiskCache("highlighting", HIGHLIGHTING_CACHE_SIZE)
+
+
+def highlighting_enabled() -> bool:
+    return os.environ.get("SYNTAX_HIGHLIGHTING") == "1"
+
+
+def _cache_key(text: str, lexer_name: str) -> tuple[str, ...]:
+    return lexer_name, HIGHLIGHTING_STYLE, hashlib.sha1(text.encode()).hexdigest()
 
-class DocxParagraphPygmentsFormatter(Formatter):
-    def __init__(self, paragraphs: list[Paragraph], creator: Callable[[], Paragraph], **options):
-        Formatter.__init__(self, style="sas", **options)
-        self._creator = creator
-        self._paragraphs = paragraphs
-        self._styles = {}
 
-        for token, style in self.style:
-            self._styles[token] = style
+def highlight_listings(listings: list[tuple[str, str]], jobs: int):
+    """Highlights the listings (code, language) that aren't cached in worker processes
+    and caches them, so set_text takes them from the cache"""
+    if not _highlighting_cache.enabled:
+        return
+    from .highlighting import lexer_name, highlight_runs
 
-    def _add_run_to_last_paragraph(self, text, style):
-        self._paragraphs[-1].add_run(text, style["bold"] or None, style["italic"] in style or None,
-                                     RGBColor.from_string(style['color']) if style['color'] else None)
+    missing = {}
+    for text, language in listings:
+        name = lexer_name(language)
+        if name is None:
+            continue  # set_text reports it
+        key = _cache_key(text, name)
+        if key not in _highlighting_cache:
+            missing[key] = text, language
+    if len(missing) < 2:
+        return
 
-    def format(self, tokensource, outfile):
-        self._paragraphs.append(self._creator())
-        for ttype, value in tokensource:
-            style = self._styles[ttype]
-            lines = iter(value.split("\n"))
-            self._add_run_to_last_paragraph(next(lines), style)
-            for line in lines:
-                self._paragraphs.append(self._creator())
-                self._add_run_to_last_paragraph(line, style)
-        self._paragraphs.pop(-1)  # remove last empty line
+    with ProcessPoolExecutor(min(jobs, len(missing))) as executor:
+        for key, body in zip(missing, executor.map(highlight_runs, *zip(*missing.values()))):
+            _highlighting_cache.put(key, body)
 
 
 LISTING_OFFSET = 254635
@@ -76,13 +87,21 @@ class Listing(Renderable, RequiresNumbering):
 
         text = text.removesuffix("\n")
 
-        if self._language and "SYNTAX_HIGHLIGHTING" in os.environ and os.environ["SYNTAX_HIGHLIGHTING"] == "1":
-            formatter = DocxParagraphPygmentsFormatter(self.paragraphs, lambda: create_paragraph())
-            try:
-                highlight(text, get_lexer_by_name(self._language), formatter)
-                return
-            except ClassNotFound:
+        if self._language and highlighting_enabled():
+            # pygments is loaded only for highlighting
+            from .highlighting import lexer_name, highlight_runs
+
+            name = lexer_name(self._language)
+            if name is None:
                 logging.warning(f"Язык {self._language} не поддерживается, синтаксис не будет подсвечен")
+            else:
+                body = _highlighting_cache.get_or_create(_cache_key(text, name),
+                                                         lambda: highlight_runs(text, self._language))
+                for runs in parse_xml(body):
+                    paragraph = create_paragraph()
+                    paragraph._docx_paragraph._p.extend(list(runs))
+                    self.paragraphs.append(paragraph)
+                return
 
         for line in text.removesuffix("\n").split("\n"):
             paragraph = create_paragraph()
@@ -92,6 +111,10 @@ class Listing(Renderable, RequiresNumbering):
     def set_number(self, number: int):
         self._number = number
 
+    def fingerprint(self):
+        return (self._number, self._caption_info.key() if self._caption_info else None,
+                tuple(paragraph.fingerprint() for paragraph in self.paragraphs))
+
     def render(self, previous_rendered: RenderedInfo, layout_state: LayoutState)\
             -> Generator[RenderedInfo | Renderable, None, None]:
         caption_rendered_infos = list(
@@ -106,7 +129,14 @@ class Listing(Renderable, RequiresNumbering):
 
         table_height = Pt(1)  # borders
 
-        for paragraph in self.paragraphs:
+        docx_paragraphs = [paragraph._docx_paragraph for paragraph in self.paragraphs]
+        for i, paragraph in enumerate(self.paragraphs):
+            if i % MEASURE_BATCH_SIZE == 0:
+                # the next lines are measured at once, each one after the previous line
+                ParagraphSizer.measure_many(docx_paragraphs[i:i+MEASURE_BATCH_SIZE],
+                                            layout_state.max_width - LISTING_OFFSET,
+                                            [docx_paragraphs[i-1] if i else None] + docx_paragraphs[i:i+MEASURE_BATCH_SIZE-1])
+
             paragraph_layout_state = copy(layout_state)
             paragraph_layout_state.max_width -= LISTING_OFFSET
             paragraph_rendered_info = next(paragraph.render(previous, paragraph_layout_state))
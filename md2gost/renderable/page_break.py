@@ -21,6 +21,9 @@ class PageBreak(Renderable):
         self._docx_paragraph.paragraph_format.space_before = 0
         self._docx_paragraph.paragraph_format.space_after = 0
 
+    def fingerprint(self):
+        return PageBreak
+
     def render(self, previous_rendered: RenderedInfo, layout_state: LayoutState)\
             -> Generator[RenderedInfo | Renderable, None, None]:
         yield RenderedInfo(
@@ -1,17 +1,22 @@
+import logging
+from copy import copy, deepcopy
 from typing import Generator
 
 from docx.table import Table
-from docx.oxml import CT_R
+from docx.oxml import CT_R, CT_RPr
 from docx.shared import Length, Parented, RGBColor, Cm
 from docx.text.paragraph import Paragraph as DocxParagraph
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from docx.text.paragraph import Run as DocxRun
 from docx.opc.constants import RELATIONSHIP_TYPE
 from docx.oxml.shared import qn
+from lxml import etree
 
 from . import Renderable
 from .paragraph_sizer import ParagraphSizer
 from ..docx_elements import create_field
+from ..latex_math import inline_latex_to_omml
+from ..style_table import get_style_table
 from ..layout_tracker import LayoutState
 from ..util import create_element
 from ..rendered_info import RenderedInfo
@@ -64,20 +69,37 @@ class Reference:
         return self._element
 
 
+# run properties by the formatting of add_run, setting them with python-docx is slow
+_run_properties: dict[tuple, CT_RPr] = {}
+
+
 class Paragraph(Renderable):
     def __init__(self, parent: Parented):
         self._parent = parent
         self._docx_paragraph = DocxParagraph(create_element("w:p"), parent)
-        self._docx_paragraph.style = "Normal"
+        self.style = "Normal"
         self._references: list[Reference] = []
 
+    def clone(self) -> "Paragraph":
+        """Returns a paragraph with a copy of the element, like a new paragraph
+        with the same properties if this one is empty"""
+        paragraph = copy(self)
+        paragraph._docx_paragraph = DocxParagraph(deepcopy(self._docx_paragraph._p), self._parent)
+        paragraph._references = []
+        return paragraph
+
     def add_run(self, text: str, is_bold: bool = None, is_italic: bool = None, color: RGBColor = None,
                 strike_through: bool = None):
-        docx_run = self._docx_paragraph.add_run(text)
-        docx_run.bold = is_bold
-        docx_run.italic = is_italic
-        docx_run.font.color.rgb = color
-        docx_run.font.strike = strike_through
+        key = (is_bold, is_italic, color, strike_through)
+        rPr = _run_properties.get(key)
+        if rPr is None:
+            docx_run = DocxRun(create_element("w:r"), self._docx_paragraph)
+            docx_run.bold = is_bold
+            docx_run.italic = is_italic
+            docx_run.font.color.rgb = color
+            docx_run.font.strike = strike_through
+            rPr = _run_properties[key] = docx_run._r.rPr
+        self._docx_paragraph.add_run(text)._r.insert(0, deepcopy(rPr))
 
     @property
     def references(self) -> list[Reference]:
@@ -101,14 +123,17 @@ class Paragraph(Renderable):
         return link
 
     def add_inline_equation(self, formula: str):
-        # omml = inline_omml(latex_to_omml(formula))
-        # for r in omml.xpath("//m:r", namespaces=omml.nsmap):
-        #     r.append(create_element("w:rPr", [
-        #         create_element("w:sz", {"w:val": "24"}),
-        #         create_element("w:szCs", {"w:val": "24"}),
-        #     ]))
-        # self._docx_paragraph._element.append(omml)
-        self.add_run(formula, is_italic=True)
+        try:
+            omml = inline_latex_to_omml(formula)
+        except ValueError:
+            logging.warning(f"Не удалось распознать формулу {formula}, она будет добавлена как текст")
+            self.add_run(formula, is_italic=True)
+            return
+        # math runs take the size of the paragraph text
+        self._docx_paragraph._p.append(omml)
+
+    def fingerprint(self):
+        return etree.tostring(self._docx_paragraph._p)
 
     @property
     def page_break_before(self) -> bool:
@@ -124,7 +149,8 @@ class Paragraph(Renderable):
 
     @style.setter
     def style(self, value: str):
-        self._docx_paragraph.style = value
+        # python-docx looks the name up among all styles on every assignment
+        self._docx_paragraph._p.style = get_style_table(self._docx_paragraph.part).style_id(value)
 
     @property
     def first_line_indent(self):
@@ -162,6 +188,7 @@ class Paragraph(Renderable):
         if layout_state.current_page_height == 0 and layout_state.page > 1:
             height_data.before = 0
 
+        skipped = 0
         fitting_lines = 0
         for lines in range(1, height_data.lines+1):
             if height_data.before + ((lines - 1) * height_data.line_spacing + 1) * height_data.line_height \
@@ -174,7 +201,8 @@ class Paragraph(Renderable):
             height = min(height_data.full, layout_state.remaining_page_height)
         elif fitting_lines <= 1 or (height_data.lines-fitting_lines == 1 and height_data.lines == 3):
             # if only no or only one line fits the page, paragraph goes to the next page
-            height = layout_state.remaining_page_height + height_data.full
+            skipped = layout_state.remaining_page_height
+            height = skipped + height_data.full
         elif height_data.lines-fitting_lines == 1:
             # if all lines except last fit the page, the last two lines go to the new page
             height = layout_state.remaining_page_height + \
@@ -188,5 +216,5 @@ class Paragraph(Renderable):
         if self.page_break_before:
             height += remaining_space
 
-        yield (previous_rendered := RenderedInfo(self._docx_paragraph, Length(height)))
+        yield (previous_rendered := RenderedInfo(self._docx_paragraph, Length(height), Length(skipped)))
         layout_state.add_height(height)
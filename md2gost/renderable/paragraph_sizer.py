@@ -1,58 +1,249 @@
-from dataclasses import dataclass
+import atexit
+from bisect import bisect_right
+from collections.abc import Callable
+from dataclasses import dataclass, replace
 from functools import cached_property
+from itertools import count
+from weakref import WeakKeyDictionary, WeakSet
 from uniseg.linebreak import line_break_units
 
 from docx.enum.text import WD_LINE_SPACING
-from docx.oxml import CT_R
+from docx.oxml.ns import qn
 from docx.text.run import Run
 from freetype import Face
 
 from docx.text.paragraph import Paragraph
-from docx.text.font import Font as DocxFont
 from docx.shared import Length, Pt, Inches
-from docx.text.parfmt import ParagraphFormat
-from docx.styles.style import _ParagraphStyle
 
+from lxml import etree
 from PIL import Image, ImageDraw, ImageFont
 
+from .batch_sizer import fit_single_lines
 from .find_font import find_font
-from ..util import merge_objects
+from .font_index import split_face_path
+from .font_metrics import FontMetrics
+from .glyph_table import GlyphTable, needs_shaping
+from ..lru_cache import LRUCache
+from ..style_table import ResolvedFormat, StyleTable, get_style_table
+
+FONT_CACHE_SIZE = 32
+RUN_FONT_CACHE_SIZE = 1024
+MEASUREMENT_CACHE_SIZE = 4096
+# widths of words and other pieces of text, per font
+WORD_WIDTH_CACHE_SIZE = 8192
+# paragraphs measured by one measure_many call in tables and listings, well below MEASUREMENT_CACHE_SIZE
+MEASURE_BATCH_SIZE = 256
+
+# the glyph table is used only if it measures this text like PIL does
+GLYPH_TABLE_PROBE = "Съешь же ещё этих мягких французских булок, да выпей чаю. " \
+                    "AVATAR Ty. Wo. «ГОСТ 7.32—2017» (fig. 1/2); 0123456789"
+GLYPH_TABLE_TOLERANCE = 1  # px
 
 
 class Font:
+    """A font at a size. The font file is opened only for metrics that are not saved yet,
+    saved metrics are updated at exit"""
+
     def __init__(self, name: str, bold: bool, italic: bool, size_pt: int):
-        path = find_font(name, bold, italic)
-        self._freetypefont = ImageFont.truetype(path, size_pt)
-        self._draw = ImageDraw.Draw(Image.new("RGB", (1000, 1000)))
+        self._path, self._face_index = split_face_path(find_font(name, bold, italic))
+        self._size_pt = size_pt
+        self._metrics = FontMetrics(self._path, size_pt, self._face_index)
+        self._values = dict(self._metrics.values)
+        self._word_widths = LRUCache("word widths", WORD_WIDTH_CACHE_SIZE)
+        _fonts.add(self)
+
+    @cached_property
+    def _freetypefont(self) -> ImageFont.FreeTypeFont:
+        return ImageFont.truetype(self._path, self._size_pt, index=self._face_index)
+
+    @cached_property
+    def _draw(self) -> ImageDraw.ImageDraw:
+        # textbbox does not depend on the canvas size
+        return ImageDraw.Draw(Image.new("RGB", (1, 1)))
+
+    @cached_property
+    def _face(self) -> Face:
+        face = Face(self._path, self._face_index)
+        face.set_char_size(int(self._size_pt * 64))
+        return face
+
+    def _value(self, name: str, compute: Callable[[], int | str | bool]):
+        if name not in self._values:
+            self._values[name] = compute()
+        return self._values[name]
+
+    def save_metrics(self):
+        table = self.__dict__.get("glyph_table")
+        if self._values != self._metrics.values or (table and table.changed):
+            self._metrics.save(self._values, table.state() if table else None)
+
+    def _get_pil_text_width(self, text: str) -> int:
+        bbox = self._draw.textbbox((0, 0), text, self._freetypefont)
+        return bbox[2] - bbox[0]
 
-        self._face = Face(path)
-        self._face.set_char_size(int(size_pt * 64))
+    @cached_property
+    def glyph_table(self) -> GlyphTable | None:
+        if self._values.get("glyph_table") is False:
+            return None
+        if self._values.get("glyph_table") and self._metrics.glyphs:
+            return GlyphTable(lambda: self._face, self._values["has_kerning"], *self._metrics.glyphs)
+
+        table = GlyphTable.from_face(self._face)
+        # PIL built with libraqm shapes and kerns text differently, measure it with PIL then
+        self._values["glyph_table"] = abs(table.text_width(GLYPH_TABLE_PROBE)
+                                          - self._get_pil_text_width(GLYPH_TABLE_PROBE)) <= GLYPH_TABLE_TOLERANCE
+        self._values["has_kerning"] = bool(self._face.has_kerning)
+        return table if self._values["glyph_table"] else None
 
     def get_text_width(self, text: str) -> Length:
         if not self.is_mono:
-            bbox = self._draw.textbbox((0, 0), text, self._freetypefont)
-            return Pt(bbox[2] - bbox[0])
+            width = self._word_widths.get(text)
+            if width is None:
+                width = self.glyph_table.text_width(text) if self.glyph_table else None
+                if width is None:
+                    # scripts that need shaping
+                    width = self._get_pil_text_width(text)
+                width = Pt(width)
+                self._word_widths.put(text, width)
+            return width
         else:
-            return Pt(len(text) * self._face.glyph.advance.x / 64)
+            return Pt(len(text) * self._mono_advance / 64)
 
     def get_line_height(self) -> Length:
         # TODO: make it work for all fonts
         # if "Times" in str(self._face.family_name) and self._freetypefont.size == 14:
         #     return Pt(16.05)
-        if "Courier" in str(self._face.family_name) and self._freetypefont.size == 12:
+        if "Courier" in self._value("family_name", lambda: str(self._face.family_name)) and self._size_pt == 12:
             return Pt(13.62)
         # else:
-        return Pt(self._face.size.height / 64)
+        return Pt(self._value("height", lambda: self._face.size.height) / 64)
+
+    def _get_advance(self, char: str) -> int:
+        self._face.load_char(char)
+        return self._face.glyph.advance.x
+
+    @cached_property
+    def _mono_advance(self) -> int:
+        return self._value("m_advance", lambda: self._get_advance("m"))
 
     @cached_property
     def is_mono(self):
-        self._face.load_char("i")
-        i_width = self._face.glyph.advance.x
-        self._face.load_char("m")
-        return i_width == self._face.glyph.advance.x
+        return self._value("i_advance", lambda: self._get_advance("i")) == self._mono_advance
         # return self._face.glyph.bitmap.width
 
 
+_fonts: "WeakSet[Font]" = WeakSet()
+
+
+@atexit.register
+def save_font_metrics():
+    for font in list(_fonts):
+        font.save_metrics()
+
+
+font_cache = LRUCache("fonts", FONT_CACHE_SIZE)
+# fonts of runs by their properties, so the properties aren't read for every run
+run_font_cache = LRUCache("run fonts", RUN_FONT_CACHE_SIZE)
+
+
+def get_font(name: str, bold: bool, italic: bool, size_pt: float) -> Font:
+    """Returns a Font shared by the whole process, so each face is loaded once"""
+    key = (name, bool(bold), bool(italic), size_pt)
+    return font_cache.get_or_create(key, lambda: Font(*key))
+
+
+class TextWidthModel:
+    """Widths of all substrings of a paragraph text.
+
+    The text is split into spans measured with one font each (a span per run, as every run is
+    measured separately). Line break units are measured with word_width, which the fonts
+    memoize by the text. For other substrings (parts of units wider than a line) the pen
+    position, the advance end and the ink extents of every character of a span with
+    a glyph table are precomputed when the span is first needed, so the width of any
+    substring is a few array lookups."""
+
+    def __init__(self, text: str, span_ends: list[int], fonts: list[Font]):
+        self.text = text
+        self._span_starts = [0] + span_ends[:-1] if span_ends else []
+        self._span_ends = span_ends
+        self._fonts = fonts
+        self._tables: list[GlyphTable | None] = [None] * len(fonts)
+        self._filled = [False] * len(fonts)
+
+        self._pens = [0] * len(text)
+        self._afters = [0] * len(text)
+        self._lefts = [0] * len(text)
+        self._rights = [0] * len(text)
+
+    def _table(self, span: int) -> GlyphTable | None:
+        if not self._filled[span]:
+            font = self._fonts[span]
+            table = font.glyph_table if not font.is_mono else None
+            if table and not self._fill_span(table, self._span_starts[span], self._span_ends[span]):
+                table = None  # the span needs shaping, it's measured by the font itself
+            self._tables[span] = table
+            self._filled[span] = True
+        return self._tables[span]
+
+    def _fill_span(self, table: GlyphTable, start: int, end: int) -> bool:
+        x = 0
+        previous = 0
+        for k in range(start, end):
+            char = self.text[k]
+            code = ord(char)
+            if (code < 0x20 or code >= 0x300) and needs_shaping(char):
+                return False
+            index, advance, left, right = table.glyph(code)
+            if previous:
+                x += table.kerning(previous, index)
+            self._pens[k] = x
+            self._lefts[k] = left
+            self._rights[k] = right
+            x += advance
+            self._afters[k] = x
+            previous = index
+        return True
+
+    def _span_width(self, span: int, start: int, end: int) -> Length:
+        table = self._table(span)
+        if table is None:
+            return self._fonts[span].get_text_width(self.text[start:end])
+        if start >= end:
+            return Pt(0)
+        # same as GlyphTable.text_width, except that only the first and the last glyphs
+        # are checked for the ink outside the advance
+        base = self._pens[start]
+        x_max = max(self._afters[end-1] - base,
+                    ((self._pens[end-1] - base + 63) & ~63) + self._rights[end-1])
+        x_min = min(0, self._lefts[start])
+        return Pt(((x_max + 63) >> 6) - (x_min >> 6))
+
+    def _spans_of(self, start: int, end: int) -> range:
+        span = max(0, bisect_right(self._span_starts, start) - 1)
+        # spans that end at the start are included to match the run by run measurement
+        while span > 0 and self._span_ends[span-1] >= start:
+            span -= 1
+        last = span
+        while last < len(self._span_ends) and self._span_starts[last] <= end:
+            last += 1
+        return range(span, last)
+
+    def width(self, start: int, end: int) -> Length:
+        width = 0
+        for span in self._spans_of(start, end):
+            width += self._span_width(span, max(start, self._span_starts[span]), min(end, self._span_ends[span]))
+        return width
+
+    def word_width(self, start: int, end: int) -> Length:
+        """Returns the width of the substring measured by the fonts of its spans"""
+        width = 0
+        for span in self._spans_of(start, end):
+            span_start = max(start, self._span_starts[span])
+            span_end = min(end, self._span_ends[span])
+            if span_start < span_end:
+                width += self._fonts[span].get_text_width(self.text[span_start:span_end])
+        return width
+
 
 @dataclass
 class ParagraphSizerResult:
@@ -71,113 +262,232 @@ class ParagraphSizerResult:
         return Length(self.before + self.line_height * self.line_spacing * self.lines + self.after)
 
 
+measurement_cache = LRUCache("paragraph sizes", MEASUREMENT_CACHE_SIZE)
+
+# styles live in the document, so equal paragraphs of different documents get different keys
+_document_keys: "WeakKeyDictionary[object, int]" = WeakKeyDictionary()
+_document_counter = count()
+
+# direct formatting that doesn't change the size of the paragraph
+_IGNORED_PPR_TAGS = {qn("w:pageBreakBefore"), qn("w:keepNext"), qn("w:keepLines")}
+
+_RUN_TAG = qn("w:r")
+_INLINE_FORMULA_TAG = qn("m:oMath")
+
+
+def _document_key(paragraph: Paragraph) -> int:
+    key = _document_keys.get(paragraph.part)
+    if key is None:
+        key = _document_keys[paragraph.part] = next(_document_counter)
+    return key
+
+
+def _ppr_key(paragraph: Paragraph) -> bytes:
+    pPr = paragraph._p.pPr
+    if pPr is None:
+        return b""
+    return b"".join(etree.tostring(child) for child in pPr if child.tag not in _IGNORED_PPR_TAGS)
+
+
+def _paragraph_key(paragraph: Paragraph) -> tuple:
+    """Returns the key of the paragraph content that the sizer depends on:
+    the paragraph properties and the properties and text of all runs and inline formulas"""
+    # bookmarks and other markup between the runs don't matter
+    return (_ppr_key(paragraph),
+            *(etree.tostring(r, with_tail=False) for r in paragraph._p.iter(_RUN_TAG, _INLINE_FORMULA_TAG)))
+
+
+def _tailor(s, breakables):
+    breakables = list(breakables)
+    for i in range(1, len(s)-1):
+        if s[i] in ("/", ):
+            if s[i-1] == " ":
+                breakables[i] = 1
+            breakables[i+1] = 0
+        if s[i] in ("$",) and s[i-1] not in {" ", "-", "—", "–"}:
+            breakables[i] = 0
+    return breakables
+
+
 class ParagraphSizer:
     def __init__(self, paragraph: Paragraph, previous_paragraph: Paragraph | None, 
                  max_width: Length, tabs_size: Length = 0):  # todo: remove tabs_size and resolve tabs here
         self.previous_paragraph = previous_paragraph
-        self.max_width = max_width
         self.paragraph = paragraph
+        self._max_width = max_width
         self._tabs_size = tabs_size
 
-        self.same_style_as_previous = (paragraph.style == previous_paragraph.style) if previous_paragraph else False
+    @cached_property
+    def _style_table(self) -> StyleTable:
+        return get_style_table(self.paragraph.part)
 
-        # Load properties
-        self.docx_font: DocxFont = merge_objects(
-            *[style.font for style in self._styles[::-1] if style.font],
-            self.paragraph.style.font)
+    @cached_property
+    def same_style_as_previous(self) -> bool:
+        return (self._style_table.style(self.paragraph) == self._style_table.style(self.previous_paragraph))\
+            if self.previous_paragraph else False
 
-        self.paragraph_format: ParagraphFormat = merge_objects(
-            *[style.paragraph_format for style in self._styles[::-1]
-              if style.paragraph_format],
-            self.paragraph.paragraph_format
-        )
+    @cached_property
+    def docx_font(self) -> ResolvedFormat:
+        return self._style_table.font(self.paragraph)
+
+    @cached_property
+    def paragraph_format(self) -> ResolvedFormat:
+        return self._style_table.paragraph_format(self.paragraph)
 
-        self.font = Font(self.docx_font.name, self.docx_font.bold, self.docx_font.italic, self.docx_font.size.pt)
+    @cached_property
+    def font(self) -> Font:
+        return get_font(self.docx_font.name, self.docx_font.bold, self.docx_font.italic, self.docx_font.size.pt)
 
+    @cached_property
+    def runs(self) -> list[Run | etree._Element]:
+        """Returns the runs and the inline formulas (m:oMath)"""
         # here self.paragraph.runs is not used because it does not always return
         # all runs (e.g. if they are inside hyperlink)
-        self.runs = []
-        for element in self.paragraph._element.getiterator():
-            if isinstance(element, CT_R):
-                self.runs.append(Run(element, self.paragraph))
-
-        self.max_width -= (self.paragraph_format.left_indent or 0) + \
-            (self.paragraph_format.right_indent or 0)
-
+        return [element if element.tag == _INLINE_FORMULA_TAG else Run(element, self.paragraph)
+                for element in self.paragraph._element.iter(_RUN_TAG, _INLINE_FORMULA_TAG)]
 
     @cached_property
-    def _default_style(self):
-
-        default_style_element = type("DefaultStyle", (), {})
-        default_style_element.rPr = \
-            self.paragraph.part.document.styles.element.xpath(
-                'w:docDefaults/w:rPrDefault/w:rPr')[0]
-        default_style_element.pPr = \
-            self.paragraph.part.document.styles.element.xpath(
-                'w:docDefaults/w:pPrDefault/w:pPr')[0]
-        default_style = _ParagraphStyle(default_style_element)
-        return default_style
+    def _formula_font(self) -> Font:
+        # the math font is not known here, formulas are estimated as italic text of the paragraph
+        return get_font(self.docx_font.name, self.docx_font.bold, True, self.docx_font.size.pt)
 
     @cached_property
-    def _styles(self) -> list[_ParagraphStyle]:
-        styles = [self.paragraph.style]
-        while styles[-1].base_style:
-            styles.append(styles[-1].base_style)
-        styles.append(self._default_style)
-        return styles
+    def max_width(self) -> Length:
+        return self._max_width - ((self.paragraph_format.left_indent or 0) +
+                                  (self.paragraph_format.right_indent or 0))
 
-    @cached_property
-    def _is_contextual_spacing(self) -> bool:
-        contextual_spacing = False
-        pPrs = [self.paragraph.paragraph_format._element.pPr] + \
-               [style._element.pPr for style in self._styles]
-        for pPr in pPrs:
-            if pPr.xpath("./w:contextualSpacing"):
-                contextual_spacing = True
-                break
-        return contextual_spacing
+    def _get_run_font(self, run: Run) -> Font:
+        rPr = run._r.rPr
+        if rPr is None:
+            return self.font
 
-    def get_text_width(self, start: int, end: int):
-        width = 0
-        pos = 0
-        for i, run in enumerate(self.runs):
-            if pos > end:
-                return width
+        def create_font():
             run_font_size = run.font.size.pt if run.font.size else None
-            font = Font(
+            return get_font(
                 run.font.name or self.docx_font.name,
                 run.font.bold or self.docx_font.bold,
                 run.font.italic or self.docx_font.italic,
                 run_font_size or self.docx_font.size.pt)
-            if pos + len(run.text) >= start:
-                width += font.get_text_width(run.text[max(0, start-pos):end-pos])
-            pos += len(run.text)
-        return width
+        key = (self.docx_font.name, self.docx_font.bold, self.docx_font.italic, self.docx_font.size,
+               etree.tostring(rPr))
+        return run_font_cache.get_or_create(key, create_font)
+
+    @cached_property
+    def _spans(self) -> tuple[str, list[int], list[Font]]:
+        """Returns the text, the ends of the runs in it and the fonts of the runs"""
+        texts = []
+        span_ends = []
+        fonts = []
+        pos = 0
+        for run in self.runs:
+            if isinstance(run, Run):
+                texts.append(run.text)
+                fonts.append(self._get_run_font(run))
+            else:
+                texts.append("".join(run.itertext()))
+                fonts.append(self._formula_font)
+            pos += len(texts[-1])
+            span_ends.append(pos)
+        return "".join(texts), span_ends, fonts
+
+    @cached_property
+    def _width_model(self) -> TextWidthModel:
+        return TextWidthModel(*self._spans)
+
+    def get_text_width(self, start: int, end: int):
+        return self._width_model.width(start, end)
+
+    def _split_overlong_unit(self, pos: int, unit: str, lines: list[str], char_width: Length | None = None) -> int:
+        """Splits the unit that doesn't fit a line by characters,
+        adds all parts except the last one to lines and returns the start of the last one.
+        Parts of monospace paragraphs are measured by char_width with the tabs expanded"""
+        def part_width(i: int, j: int, x: Length) -> float:
+            if char_width is not None:
+                return self._expand(x, unit[i:j], char_width) - x
+            width = self.get_text_width(pos+i, pos+j)
+            if not self.font.is_mono:
+                width *= 1.001  # word compresses characters to fit one more character into the line
+            return width
+
+        first_line_x = (self.paragraph_format.first_line_indent or 0) + self._tabs_size
+
+        i = 0
+        j = 0
+        while True:
+            x = first_line_x if len(lines) == 0 else 0
+            # the part width grows with its end, so the first end that doesn't fit is bisected
+            j = bisect_right(range(j, len(unit)+1), self.max_width - x, key=lambda end: part_width(i, end, x)) + j
+            if j > len(unit):
+                return i
+            lines.append(unit[i:j-1])
+            i = j-1
+            j += 1
+
+    @cached_property
+    def _mono_advance(self) -> int | None:
+        """Returns the advance of the characters if the paragraph is set in monospace fonts
+        of the same width in whole pixels, so its widths are character counts times the advance"""
+        advance = self.font._mono_advance
+        if advance % 64 or not all(font.is_mono and font._mono_advance == advance
+                                   for font in [self.font, *self._spans[2]]):
+            return None
+        return advance
+
+    def _expand(self, x: Length, text: str, char_width: Length) -> Length:
+        """Returns the position after the text that starts at x, tabs move it to the next tab stop"""
+        if "\t" not in text:
+            return x + len(text) * char_width
+        tab_stop = self._style_table.default_tab_stop
+        parts = text.split("\t")
+        for part in parts[:-1]:
+            x += len(part) * char_width
+            x = (x // tab_stop + 1) * tab_stop
+        return x + len(parts[-1]) * char_width
+
+    def _split_mono_lines(self, advance: int) -> list[str]:
+        text = self._spans[0]
+        char_width = Pt(advance // 64)
+        line_width = (self.paragraph_format.first_line_indent or 0) + self._tabs_size
+
+        if "\t" not in text and line_width + len(text.rstrip()) * char_width <= self.max_width:
+            return [text.rstrip()]
+
+        lines = [""]
+        pos = 0
+        for unit in line_break_units(text, tailor=_tailor):
+            no_spaces_width = self._expand(line_width, unit.rstrip(), char_width) - line_width
+            if no_spaces_width <= self.max_width - line_width:
+                line_width = self._expand(line_width, unit, char_width)
+                lines[-1] += unit
+            elif no_spaces_width > self.max_width:
+                if lines[-1] == "":
+                    lines.pop(-1)
+                i = self._split_overlong_unit(pos, unit, lines, char_width)
+                lines.append(unit[i:])
+                line_width = self._expand(0, unit[i:], char_width)
+            else:
+                lines.append(unit)
+                line_width = self._expand(0, unit, char_width)
+            pos += len(unit)
+
+        return [line.rstrip() for line in lines]
 
     def split_lines(self):
+        if self._mono_advance is not None:
+            return self._split_mono_lines(self._mono_advance)
+
         space_width = self.font.get_text_width(" ")
         if not self.font.is_mono:
             space_width *= 0.825
 
-        text = "".join([run.text for run in self.runs])
-
-        def tailor(s, breakables):
-            breakables = list(breakables)
-            for i in range(1, len(s)-1):
-                if s[i] in ("/", ):
-                    if s[i-1] == " ":
-                        breakables[i] = 1
-                    breakables[i+1] = 0
-                if s[i] in ("$",) and s[i-1] not in {" ", "-", "—", "–"}:
-                    breakables[i] = 0
-            return breakables
+        text = self._width_model.text
 
         line_width = (self.paragraph_format.first_line_indent or 0) + self._tabs_size
         lines = [""]
         pos = 0
-        for unit in line_break_units(text, tailor=tailor):
+        for unit in line_break_units(text, tailor=_tailor):
             spaces = len(unit) - len(unit.rstrip())
-            no_spaces_width = self.get_text_width(pos, pos+len(unit)-spaces)
+            no_spaces_width = self._width_model.word_width(pos, pos+len(unit)-spaces)
             full_width = no_spaces_width + spaces*space_width
             if no_spaces_width <= self.max_width - line_width:
                 line_width += full_width
@@ -185,15 +495,7 @@ class ParagraphSizer:
             elif no_spaces_width > self.max_width:
                 if lines[-1] == "":
                     lines.pop(-1)
-                i = 0
-                for j in range(len(unit)+1):
-                    part_width = self.get_text_width(pos+i, pos+j)
-                    if not self.font.is_mono:
-                        part_width *= 1.001  # word compresses characters
-                        # to fit one more character into the line
-                    if part_width > (self.max_width if len(lines) != 0 else self.max_width-((self.paragraph_format.first_line_indent or 0) + self._tabs_size)):
-                        lines.append(unit[i:j-1])
-                        i = j-1
+                i = self._split_overlong_unit(pos, unit, lines)
                 lines.append(unit[i:])
                 line_width = self.font.get_text_width(unit[i:])
             else:
@@ -203,24 +505,54 @@ class ParagraphSizer:
 
         return [line.rstrip() for line in lines]
 
+    def _measurement_key(self) -> tuple:
+        previous_key = _ppr_key(self.previous_paragraph) if self.previous_paragraph else None
+        return (_document_key(self.paragraph), _paragraph_key(self.paragraph),
+                self._max_width, self._tabs_size, previous_key)
+
     def calculate_height(self) -> ParagraphSizerResult:
-        lines = len(self.split_lines())
-
-        previous_paragraph_format: ParagraphFormat = None
-        if self.previous_paragraph:
-            previous_paragraph_styles = [self.previous_paragraph.style]
-            while previous_paragraph_styles[-1].base_style:
-                previous_paragraph_styles.append(
-                    previous_paragraph_styles[-1].base_style
-                )
-            previous_paragraph_styles.append(self._default_style)
-            previous_paragraph_format = merge_objects(
-                *[style.paragraph_format for style in previous_paragraph_styles[::-1]
-                    if style.paragraph_format],
-                self.previous_paragraph.paragraph_format
-            )
-
-        if self._is_contextual_spacing and self.same_style_as_previous:
+        """Returns the size of the paragraph. Results are memoized by the paragraph content,
+        width and the previous paragraph, so changes of document styles made after
+        the measurement are not noticed."""
+        # the result is copied because callers adjust it
+        return replace(measurement_cache.get_or_create(self._measurement_key(), self._calculate_height))
+
+    @classmethod
+    def measure_many(cls, paragraphs: list[Paragraph], max_width: Length,
+                     previous_paragraphs: list[Paragraph | None] | None = None) -> list[ParagraphSizerResult]:
+        """Measures a batch of paragraphs like table cells or listing lines.
+
+        Paragraphs that surely fit one line are found in one vectorized pass over the batch,
+        only the others are split into lines. The results are memoized like in calculate_height,
+        so the following calculate_height calls for these paragraphs are cache hits."""
+        sizers = [cls(paragraph, previous_paragraph, max_width) for paragraph, previous_paragraph
+                  in zip(paragraphs, previous_paragraphs or [None] * len(paragraphs))]
+        keys = [sizer._measurement_key() for sizer in sizers]
+
+        results = {}
+        missing = {}
+        for sizer, key in zip(sizers, keys):
+            if key not in results and key not in missing:
+                result = measurement_cache.get(key)
+                if result is None:
+                    missing[key] = sizer
+                else:
+                    results[key] = result
+
+        for (key, sizer), single_line in zip(missing.items(), fit_single_lines(list(missing.values()))):
+            results[key] = sizer._calculate_height(1 if single_line else None)
+            measurement_cache.put(key, results[key])
+
+        return [replace(results[key]) for key in keys]
+
+    def _calculate_height(self, lines: int | None = None) -> ParagraphSizerResult:
+        if lines is None:
+            lines = len(self.split_lines())
+
+        previous_paragraph_format = self._style_table.paragraph_format(self.previous_paragraph)\
+            if self.previous_paragraph else None
+
+        if self._style_table.is_contextual_spacing(self.paragraph) and self.same_style_as_previous:
             before = (previous_paragraph_format.space_after or 0)
         else:
             before = (self.paragraph_format.space_before or 0)
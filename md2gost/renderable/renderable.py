@@ -1,5 +1,5 @@
 from __future__ import annotations
-from collections.abc import Generator
+from collections.abc import Generator, Hashable
 from abc import ABC, abstractmethod
 
 from ..layout_tracker import LayoutState
@@ -13,3 +13,12 @@ class Renderable(ABC):
 
     def added_to_document(self):
         pass
+
+    def fingerprint(self) -> Hashable | None:
+        """Returns a value that is equal for renderables that render the same way,
+        or None if the output of the previous rendering can't be reused"""
+        return None
+
+    def reuse(self, rendered: Renderable, pages_delta: int):
+        """Called instead of render when the output of an equal renderable from
+        the previous rendering is kept, moved by pages_delta pages"""
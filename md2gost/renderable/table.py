@@ -1,10 +1,12 @@
-from copy import copy
+from copy import copy, deepcopy
 from typing import Generator
 
-from docx.shared import Parented, Pt, Twips, Cm
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.shared import Parented, Pt, Twips, Cm, RGBColor
 
-from . import Paragraph
+from . import Paragraph, Link
 from .caption import Caption, CaptionInfo
+from .paragraph_sizer import ParagraphSizer, MEASURE_BATCH_SIZE
 from .renderable import Renderable
 from .requires_numbering import RequiresNumbering
 from ..docx_elements import *
@@ -16,6 +18,42 @@ from ..rendered_info import RenderedInfo
 CELL_OFFSET = Cm(0.3795)
 
 
+class CellParagraph:
+    """A paragraph of a table cell kept as the calls that fill it (runs, links, references)
+    until its row is rendered, so tables with many rows don't hold docx elements"""
+
+    def __init__(self):
+        self.alignment: WD_PARAGRAPH_ALIGNMENT | None = None
+        self._calls: list[tuple] = []
+
+    def add_run(self, text: str, is_bold: bool = None, is_italic: bool = None, color: RGBColor = None,
+                strike_through: bool = None):
+        self._calls.append(("add_run", text, is_bold, is_italic, color, strike_through))
+
+    def add_reference(self, unique_name: str):
+        self._calls.append(("add_reference", unique_name))
+
+    def add_inline_equation(self, formula: str):
+        self._calls.append(("add_inline_equation", formula))
+
+    def add_link_url(self, url: str) -> "CellParagraph":
+        link = CellParagraph()
+        self._calls.append(("add_link_url", url, link))
+        return link
+
+    def key(self) -> tuple:
+        return self.alignment, tuple((*call[:-1], call[-1].key()) if call[0] == "add_link_url" else call
+                                     for call in self._calls)
+
+    def fill(self, paragraph: Paragraph | Link):
+        for name, *args in self._calls:
+            if name == "add_link_url":
+                url, link = args
+                link.fill(paragraph.add_link_url(url))
+            else:
+                getattr(paragraph, name)(*args)
+
+
 class Table(Renderable, RequiresNumbering):
     def __init__(self, parent: Parented, rows: int, cols: int, caption_info: CaptionInfo):
         super().__init__("Таблица", caption_info.unique_name if caption_info else None)
@@ -32,20 +70,30 @@ class Table(Renderable, RequiresNumbering):
         self._table_width = sect.page_width - sect.left_margin - sect.right_margin + left_margin + right_margin
         self._number = "?"
 
-        self._rows: list[list[list[Paragraph]]] = [[[] for i in range(cols)] for j in range(rows)]
+        self._rows: list[list[list[CellParagraph]]] = [[[] for i in range(cols)] for j in range(rows)]
 
-    def add_paragraph_to_cell(self, row: int, col: int) -> Paragraph:
+    def add_paragraph_to_cell(self, row: int, col: int) -> CellParagraph:
+        paragraph = CellParagraph()
+        self._rows[row][col].append(paragraph)
+        return paragraph
+
+    def _create_paragraph_template(self, alignment: WD_PARAGRAPH_ALIGNMENT | None) -> Paragraph:
         paragraph = Paragraph(self._parent)
         paragraph.first_line_indent = 0
         paragraph._docx_paragraph.paragraph_format.space_before = 0
         paragraph._docx_paragraph.paragraph_format.space_after = 0
         paragraph._docx_paragraph.paragraph_format.line_spacing = 1
-        self._rows[row][col].append(paragraph)
+        paragraph.alignment = alignment
         return paragraph
 
     def set_number(self, number):
         self._number = number
 
+    def fingerprint(self):
+        return (self._number, self._caption_info.key() if self._caption_info else None,
+                tuple(tuple(tuple(paragraph.key() for paragraph in cell) for cell in row)
+                      for row in self._rows))
+
     def render(self, previous_rendered: RenderedInfo, layout_state: LayoutState)\
             -> Generator[RenderedInfo | Renderable, None, None]:
         caption_rendered_infos = list(
@@ -59,55 +107,78 @@ class Table(Renderable, RequiresNumbering):
 
         table_height = Pt(1.5)
 
-        for row in self._rows:
-            docx_row = create_table_row(docx_table)
-            row_height = 0
-            for i in range(self._cols):
-                docx_cell = create_table_cell(docx_row, self._table_width / self._cols)
-                cell_height = 0
-                for paragraph in row[i]:
-                    cell_layout_state = LayoutState(
-                        layout_state.max_height, layout_state.max_width
-                    )
-                    cell_layout_state.max_width = self._table_width / self._cols - CELL_OFFSET
-                    for paragraph_rendered_info in paragraph.render(None, cell_layout_state):
-                        docx_cell._element.append(paragraph_rendered_info.docx_element._element)
-                        cell_height += paragraph_rendered_info.height
+        cell_max_width = self._table_width / self._cols - CELL_OFFSET
+        batch_rows = max(1, MEASURE_BATCH_SIZE // self._cols)
+
+        # cells and their paragraphs are copies of elements created once for the table
+        cell_template = create_table_cell(create_table_row(docx_table), self._table_width / self._cols)._element
+        paragraph_templates: dict[WD_PARAGRAPH_ALIGNMENT | None, Paragraph] = {}
+
+        def create_paragraph(cell_paragraph: CellParagraph) -> Paragraph:
+            template = paragraph_templates.get(cell_paragraph.alignment)
+            if template is None:
+                template = paragraph_templates[cell_paragraph.alignment] = \
+                    self._create_paragraph_template(cell_paragraph.alignment)
+            paragraph = template.clone()
+            cell_paragraph.fill(paragraph)
+            return paragraph
+
+        # rows are created and measured in batches while they are added to the table
+        batches = (self._rows[i:i+batch_rows] for i in range(0, len(self._rows), batch_rows))
+        for batch in batches:
+            batch = [[[create_paragraph(paragraph) for paragraph in cell] for cell in row] for row in batch]
+            results = iter(ParagraphSizer.measure_many(
+                [paragraph._docx_paragraph for row in batch for cell in row for paragraph in cell], cell_max_width))
+
+            for row in batch:
+                docx_row = create_table_row(docx_table)
+                row_height = 0
+                for cell in row:
+                    docx_cell = deepcopy(cell_template)
+                    cell_height = 0
+                    for paragraph in cell:
+                        height = next(results).full
+                        if height > layout_state.max_height:
+                            # a paragraph longer than a page is laid out as on a page of its own
+                            cell_layout_state = LayoutState(layout_state.max_height, cell_max_width)
+                            height = sum(info.height for info in paragraph.render(None, cell_layout_state))
+                        docx_cell.append(paragraph._docx_paragraph._p)
+                        cell_height += height
                     row_height = max(cell_height, row_height)
-                docx_row._element.append(docx_cell._element)
+                    docx_row._element.append(docx_cell)
 
-            row_height += Pt(0.5)
+                row_height += Pt(0.5)
 
-            if row_height > layout_state.remaining_page_height:
-                table_rendered_info = RenderedInfo(docx_table, table_height)
-                yield table_rendered_info
+                if row_height > layout_state.remaining_page_height:
+                    table_rendered_info = RenderedInfo(docx_table, table_height)
+                    yield table_rendered_info
 
-                # borders do not take space in the beginning of the page
-                table_height = 0
+                    # borders do not take space in the beginning of the page
+                    table_height = 0
 
-                continuation_paragraph = Paragraph(self._parent)
-                continuation_paragraph.add_run(f"Продолжение таблицы ")
-                continuation_paragraph\
-                    .add_reference(self._caption_info.unique_name)\
-                    .set_number(int(self._number))
-                continuation_paragraph.style = "Caption"
-                continuation_paragraph.first_line_indent = 0
-                continuation_paragraph.page_break_before = True
+                    continuation_paragraph = Paragraph(self._parent)
+                    continuation_paragraph.add_run(f"Продолжение таблицы ")
+                    continuation_paragraph\
+                        .add_reference(self._caption_info.unique_name)\
+                        .set_number(int(self._number))
+                    continuation_paragraph.style = "Caption"
+                    continuation_paragraph.first_line_indent = 0
+                    continuation_paragraph.page_break_before = True
 
-                continuation_rendered_info = next(
-                    continuation_paragraph.render(None, copy(layout_state)))
+                    continuation_rendered_info = next(
+                        continuation_paragraph.render(None, copy(layout_state)))
 
-                layout_state.add_height(continuation_rendered_info.height)
-                yield continuation_rendered_info
+                    layout_state.add_height(continuation_rendered_info.height)
+                    yield continuation_rendered_info
 
-                docx_table = create_table(self._parent, 0, self._cols, self._table_width)
+                    docx_table = create_table(self._parent, 0, self._cols, self._table_width)
 
-                # previous = None
+                    # previous = None
 
-            docx_table._element.append(docx_row._element)
-            layout_state.add_height(row_height)
-            table_height += row_height
+                docx_table._element.append(docx_row._element)
+                layout_state.add_height(row_height)
+                table_height += row_height
 
-            # previous = paragraph_rendered_info
+                # previous = paragraph_rendered_info
 
         yield RenderedInfo(docx_table, table_height)
@@ -43,8 +43,8 @@ class ToC(Renderable):
     def __init__(self, parent: Parented):
         self._parent = parent
         self._paragraphs: list[Paragraph] = []
+        self._page_runs: list[Run | None] = []
         self._numbering = [0 for _ in range(10)]
-        pass
 
     def add_item(self, level: int, title: str, numbered: bool, anchor: str):
         """Adds items to TOC. Must be called before rendering"""
@@ -71,9 +71,22 @@ class ToC(Renderable):
         hyperlink.add_run(f"\t")
 
         self._paragraphs.append(paragraph)
+        self._page_runs.append(None)
 
     def set_page(self, index: int, page: int):
-        self._paragraphs[index].add_run(str(page))
+        if self._page_runs[index] is None:
+            self._paragraphs[index].add_run(str(page))
+            self._page_runs[index] = self._paragraphs[index]._docx_paragraph.runs[-1]
+        else:
+            self._page_runs[index].text = str(page)
+
+    def fingerprint(self):
+        return tuple(paragraph.fingerprint() for paragraph in self._paragraphs)
+
+    def reuse(self, rendered: "ToC", pages_delta: int):
+        # pages are set to the paragraphs in the document
+        self._paragraphs = rendered._paragraphs
+        self._page_runs = rendered._page_runs
 
     def render(self, previous_rendered: RenderedInfo, layout_state: LayoutState)\
             -> Generator[RenderedInfo | Renderable, None, None]:
@@ -6,3 +6,5 @@ from docx.shared import Parented, Length
 class RenderedInfo:
     docx_element: Parented
     height: Length
+    # the end of the previous page that the height includes, the element starts on the next page
+    skipped: Length = Length(0)
@@ -0,0 +1,145 @@
+from functools import cached_property
+from weakref import WeakKeyDictionary
+
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml.ns import qn
+from docx.shared import Length, Twips
+from docx.styles.style import _ParagraphStyle
+from docx.text.font import Font as DocxFont
+from docx.text.paragraph import Paragraph
+from docx.text.parfmt import ParagraphFormat
+from lxml import etree
+
+from .lru_cache import LRUCache
+
+PARAGRAPH_FORMAT_ATTRIBUTES = (
+    "alignment", "first_line_indent", "keep_together", "keep_with_next", "left_indent", "line_spacing",
+    "line_spacing_rule", "page_break_before", "right_indent", "space_after", "space_before", "widow_control")
+FONT_ATTRIBUTES = ("name", "size", "bold", "italic", "all_caps", "small_caps", "subscript", "superscript")
+
+DIRECT_FORMAT_CACHE_SIZE = 256
+
+_PSTYLE_TAG = qn("w:pStyle")
+DEFAULT_TAB_STOP = Twips(720)
+
+
+class ResolvedFormat:
+    """Effective values of the formatting attributes, where the latest format has
+    the highest priority. An attribute is None if no format sets it."""
+
+    def __init__(self, attributes: tuple[str, ...], *formats):
+        for name in attributes:
+            value = None
+            for format_ in formats:
+                value = _value(format_, name, value)
+            setattr(self, name, value)
+
+    def overlay(self, format_) -> "ResolvedFormat":
+        """Returns a copy with the values set in format_ taking precedence"""
+        resolved = object.__new__(ResolvedFormat)
+        for name, value in vars(self).items():
+            setattr(resolved, name, _value(format_, name, value))
+        return resolved
+
+
+def _value(format_, name: str, default):
+    value = getattr(format_, name)
+    return default if value is None else value
+
+
+class StyleTable:
+    """Resolved fonts and paragraph formats of the document styles.
+
+    Each style is resolved once through its base styles and docDefaults, so getting
+    the format of a paragraph only overlays its direct formatting. The table doesn't
+    notice changes of the styles made after a style was resolved."""
+
+    def __init__(self, part):
+        self._part = part
+        self._paragraph_formats: dict[str | None, ResolvedFormat] = {}
+        self._fonts: dict[str | None, ResolvedFormat] = {}
+        self._contextual_spacing: dict[str | None, bool] = {}
+        self._styles: dict[str | None, _ParagraphStyle] = {}
+        self._style_ids: dict[str, str | None] = {}
+        # formats of paragraphs with direct formatting by the style and the paragraph properties
+        self._direct_formats = LRUCache("paragraph formats", DIRECT_FORMAT_CACHE_SIZE)
+
+        styles_element = part.styles.element
+        default_style_element = type("DefaultStyle", (), {})
+        default_style_element.rPr = next(iter(styles_element.xpath("w:docDefaults/w:rPrDefault/w:rPr")), None)
+        default_style_element.pPr = next(iter(styles_element.xpath("w:docDefaults/w:pPrDefault/w:pPr")), None)
+        self._default_style = _ParagraphStyle(default_style_element)
+
+    @cached_property
+    def default_tab_stop(self) -> Length:
+        element = self._part.document.settings.element.find(qn("w:defaultTabStop"))
+        if element is None or not int(element.get(qn("w:val"), 0)):
+            return DEFAULT_TAB_STOP
+        return Twips(int(element.get(qn("w:val"))))
+
+    def style_id(self, name: str) -> str | None:
+        """Returns the id of the paragraph style with the name, None for the default style"""
+        if name not in self._style_ids:
+            self._style_ids[name] = self._part.get_style_id(name, WD_STYLE_TYPE.PARAGRAPH)
+        return self._style_ids[name]
+
+    def style(self, paragraph: Paragraph) -> _ParagraphStyle:
+        style_id = paragraph._p.style
+        style = self._styles.get(style_id)
+        if style is None:
+            style = self._styles[style_id] = self._part.get_style(style_id, WD_STYLE_TYPE.PARAGRAPH)
+        return style
+
+    def _chain(self, paragraph: Paragraph) -> list[_ParagraphStyle]:
+        """Returns the styles from docDefaults to the paragraph style"""
+        styles = [self.style(paragraph)]
+        while styles[-1].base_style:
+            styles.append(styles[-1].base_style)
+        styles.append(self._default_style)
+        return styles[::-1]
+
+    def font(self, paragraph: Paragraph) -> ResolvedFormat:
+        """Returns the font of the paragraph style, the result must not be modified"""
+        style_id = paragraph._p.style
+        font = self._fonts.get(style_id)
+        if font is None:
+            font = self._fonts[style_id] = ResolvedFormat(
+                FONT_ATTRIBUTES, *[DocxFont(style._element) for style in self._chain(paragraph)])
+        return font
+
+    def paragraph_format(self, paragraph: Paragraph) -> ResolvedFormat:
+        """Returns the effective paragraph format, the result must not be modified"""
+        style_id = paragraph._p.style
+        paragraph_format = self._paragraph_formats.get(style_id)
+        if paragraph_format is None:
+            paragraph_format = self._paragraph_formats[style_id] = ResolvedFormat(
+                PARAGRAPH_FORMAT_ATTRIBUTES,
+                *[ParagraphFormat(style._element) for style in self._chain(paragraph)])
+        pPr = paragraph._p.pPr
+        if pPr is None or all(child.tag == _PSTYLE_TAG for child in pPr):
+            return paragraph_format
+        return self._direct_formats.get_or_create((style_id, etree.tostring(pPr)),
+                                                  lambda: paragraph_format.overlay(paragraph.paragraph_format))
+
+    def is_contextual_spacing(self, paragraph: Paragraph) -> bool:
+        pPr = paragraph._p.pPr
+        if pPr is not None and pPr.find(qn("w:contextualSpacing")) is not None:
+            return True
+        style_id = paragraph._p.style
+        contextual_spacing = self._contextual_spacing.get(style_id)
+        if contextual_spacing is None:
+            contextual_spacing = self._contextual_spacing[style_id] = any(
+                style._element.pPr is not None and style._element.pPr.find(qn("w:contextualSpacing")) is not None
+                for style in self._chain(paragraph))
+        return contextual_spacing
+
+
+_style_tables: "WeakKeyDictionary[object, StyleTable]" = WeakKeyDictionary()
+
+
+def get_style_table(part) -> StyleTable:
+    """Returns the style table of the document part"""
+    table = _style_tables.get(part)
+    if table is None:
+        table = _style_tables[part] = StyleTable(part)
+    return table
@@ -1,3 +1,6 @@
+import os
+import sys
+
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
 from lxml.etree import _Element
@@ -34,27 +37,18 @@ def create_element(name: str, *args: dict[str, str] | list[_Element] | str)\
     return element
 
 
-def merge_objects(*objects):
-    from inspect import getmembers, ismethod
-    """
-    Returns the new object containing attributes from objects, where the latest
-    one has the highest priority.
-    """
-
-    class MergedObject:
+def get_cache_dir() -> str:
+    """Returns the directory for persistent caches (MD2GOST_CACHE_DIR overrides it)"""
+    path = os.environ.get("MD2GOST_CACHE_DIR")
+    if not path:
+        if sys.platform == "win32":
+            base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        else:
+            base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+        path = os.path.join(base, "md2gost")
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
         pass
+    return path
 
-    merged_object = MergedObject()
-    for name, value in getmembers(objects[0]):
-        if name.startswith("_") or ismethod(value):
-            continue
-        merged_object.__setattr__(name, value)
-
-    for object_ in objects[1:]:
-        for name, value in getmembers(object_):
-            if name.startswith("_") or ismethod(value):
-                continue
-            if value is not None:
-                merged_object.__setattr__(name, value)
-
-    return merged_object
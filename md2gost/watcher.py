@@ -0,0 +1,35 @@
+import os
+from collections.abc import Iterable
+
+
+def _mtime(path: str) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class Watcher:
+    """Polls modification times of the input files and the files they include"""
+
+    def __init__(self, input_paths: Iterable[str], dependencies: Iterable[str] = ()):
+        self._input_paths = list(input_paths)
+        self._mtimes = self._poll(dependencies)
+
+    def _poll(self, dependencies: Iterable[str]) -> dict[str, int | None]:
+        return {path: _mtime(path) for path in [*self._input_paths, *dependencies]}
+
+    def set_dependencies(self, dependencies: Iterable[str]):
+        """Replaces the watched included files. Files that were watched keep their state,
+        so changes made during a rebuild are noticed by the next changed call"""
+        self._mtimes = {path: self._mtimes[path] if path in self._mtimes else _mtime(path)
+                        for path in [*self._input_paths, *dependencies]}
+
+    def changed(self) -> bool:
+        """Returns whether a file changed since the last call. Input files are often
+        replaced on save, so while one is missing there is no change yet"""
+        mtimes = self._poll(path for path in self._mtimes if path not in self._input_paths)
+        if mtimes == self._mtimes or any(mtimes[path] is None for path in self._input_paths):
+            return False
+        self._mtimes = mtimes
+        return True
@@ -1,3 +1,8 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
 import docx
 from docx.document import Document
 from docx.enum.style import WD_STYLE_TYPE
@@ -31,3 +36,13 @@ def _create_test_document():
     # they are a bit larger than they should be
 
     return document, max_height, max_width
+
+
+def _use_temporary_cache_dir(test_case: unittest.TestCase, **environ: str) -> str:
+    """Keeps the disk caches of the test in a temporary directory, returns its path"""
+    directory = tempfile.TemporaryDirectory()
+    test_case.addCleanup(directory.cleanup)
+    patcher = mock.patch.dict(os.environ, {"MD2GOST_CACHE_DIR": directory.name, **environ})
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+    return directory.name
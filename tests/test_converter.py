@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+from docx.opc.constants import RELATIONSHIP_TYPE
+from PIL import Image
+
+from md2gost.__main__ import batch
+from md2gost.converter import Converter, convert_file
+from md2gost.renderable import Image as ImageRenderable
+
+from . import _use_temporary_cache_dir
+
+IMAGE_PATH = os.path.join(os.path.dirname(__file__), "..", "images", "crossreferencing.png")
+
+
+class TestConvertFile(unittest.TestCase):
+    def setUp(self):
+        _use_temporary_cache_dir(self)
+
+    def test_error(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output_path = os.path.join(directory, "report.docx")
+            self.assertIsNotNone(convert_file(os.path.join(directory, "missing.md"), output_path))
+            self.assertFalse(os.path.exists(output_path))
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        _use_temporary_cache_dir(self)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self._directory = directory.name
+        self._filenames = []
+        for name in ["first", "second"]:
+            self._filenames.append(os.path.join(self._directory, f"{name}.md"))
+            with open(self._filenames[-1], "w", encoding="utf-8") as f:
+                f.write(f"# Глава {name}\n\nТекст\n")
+
+    def _output(self, name: str) -> str:
+        return os.path.join(self._directory, "output", f"{name}.docx")
+
+    def test_converted(self):
+        self.assertEqual(0, batch(self._filenames, os.path.join(self._directory, "output"), None, None, 1, 2))
+        self.assertTrue(os.path.exists(self._output("first")))
+        self.assertTrue(os.path.exists(self._output("second")))
+
+    def test_broken_worker(self):
+        def convert_or_break(filename, output, *args):
+            if filename == self._filenames[0]:
+                raise BrokenProcessPool()
+            return convert_file(filename, output, *args)
+
+        with mock.patch("concurrent.futures.ProcessPoolExecutor", ThreadPoolExecutor), \
+                mock.patch("md2gost.converter.convert_file", convert_or_break), self.assertLogs(level="ERROR"):
+            self.assertEqual(1, batch(self._filenames, os.path.join(self._directory, "output"), None, None, 1, 1))
+        self.assertFalse(os.path.exists(self._output("first")))
+        self.assertTrue(os.path.exists(self._output("second")))
+
+
+class TestConverterUpdate(unittest.TestCase):
+    def setUp(self):
+        _use_temporary_cache_dir(self)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self._image_path = shutil.copy(IMAGE_PATH, os.path.join(directory.name, "image.png"))
+        self._input_path = os.path.join(directory.name, "report.md")
+        with open(self._input_path, "w", encoding="utf-8") as f:
+            f.write("# Глава\n\nТекст\n\n![Рисунок](image.png)\n")
+        self._converter = Converter([self._input_path], os.path.join(directory.name, "report.docx"))
+        self._converter.convert()
+
+    def _images(self) -> list[str]:
+        return [r_id for r_id, relationship in self._converter.document.part.rels.items()
+                if relationship.reltype == RELATIONSHIP_TYPE.IMAGE]
+
+    def test_replaced_image(self):
+        Image.new("RGB", (20, 10), "red").save(self._image_path)
+        self._converter.update()
+
+        self.assertEqual(1, len(self._images()))
+
+    def test_failed_update(self):
+        with open(self._input_path, "w", encoding="utf-8") as f:
+            f.write("# Глава\n\nТекст\n\nЕщё текст\n\n![Рисунок](image.png)\n")
+        render = ImageRenderable.render
+
+        def render_and_fail(image, *args):
+            # the output added before the error stays in the document
+            yield from render(image, *args)
+            raise RuntimeError()
+
+        with mock.patch.object(ImageRenderable, "render", render_and_fail):
+            with self.assertRaises(RuntimeError):
+                self._converter.update()
+
+        self._converter.update()
+        converter = Converter([self._input_path], self._converter._output_path)
+        converter.convert()
+        self.assertEqual([paragraph.text for paragraph in converter.document.paragraphs],
+                         [paragraph.text for paragraph in self._converter.document.paragraphs])
+        self.assertEqual(len(converter.document._body._element), len(self._converter.document._body._element))
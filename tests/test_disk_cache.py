@@ -0,0 +1,55 @@
+import os
+import time
+import unittest
+from unittest import mock
+
+from md2gost.disk_cache import DiskCache
+
+from . import _use_temporary_cache_dir
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        _use_temporary_cache_dir(self)
+
+    def test_put_get(self):
+        DiskCache("test").put(("a", "b"), b"value")
+
+        cache = DiskCache("test")
+        self.assertEqual(b"value", cache.get(("a", "b")))
+        self.assertIsNone(cache.get(("a", "c")))
+        self.assertIsNone(DiskCache("other").get(("a", "b")))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_get_or_create(self):
+        cache = DiskCache("test")
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return b"value"
+
+        self.assertEqual(b"value", cache.get_or_create(("key",), factory))
+        self.assertEqual(b"value", cache.get_or_create(("key",), factory))
+        self.assertEqual(1, len(calls))
+
+    def test_evicts_least_recently_used(self):
+        cache = DiskCache("test", 300)
+        for name in "abc":
+            cache.put((name,), b"x" * 100)
+            # the modification times of the files order them
+            time.sleep(0.01)
+        cache.get(("a",))
+        cache.put(("d",), b"x" * 100)
+
+        self.assertIn(("a",), cache)
+        self.assertNotIn(("b",), cache)
+        self.assertIn(("d",), cache)
+
+    def test_disabled(self):
+        cache = DiskCache("test")
+        cache.put(("a",), b"value")
+        with mock.patch.dict(os.environ, {"MD2GOST_NO_CACHE": "1"}):
+            self.assertIsNone(cache.get(("a",)))
+            cache.put(("b",), b"value")
+        self.assertIsNone(cache.get(("b",)))
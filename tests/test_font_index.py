@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from md2gost.renderable.font_index import FontIndex, fontconfig_dirs, split_face_path
+
+
+def _find_any_font() -> str | None:
+    for root_dir in fontconfig_dirs():
+        for dir_path, _, file_names in os.walk(root_dir):
+            for file_name in file_names:
+                if file_name.lower().endswith(".ttf"):
+                    return os.path.join(dir_path, file_name)
+    return None
+
+
+@unittest.skipUnless(_find_any_font(), "no fonts installed")
+class TestFontIndex(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._fonts_dir = os.path.join(self._dir, "fonts")
+        os.mkdir(self._fonts_dir)
+        self._index_path = os.path.join(self._dir, "index.json")
+
+        self._font_path = shutil.copy(_find_any_font(), self._fonts_dir)
+        index = FontIndex([self._fonts_dir], None)
+        index.rebuild()
+        self._path, self._families, _, self._bold, self._italic = index._fonts[0]
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def test_find(self):
+        index = FontIndex([self._fonts_dir], self._index_path)
+        self.assertEqual(self._font_path, index.find(self._families[0], self._bold, self._italic))
+        self.assertIsNone(index.find(self._families[0], self._bold, not self._italic))
+        self.assertIsNone(index.find("No Such Font", False, False))
+
+    def test_loads_saved_index(self):
+        FontIndex([self._fonts_dir], self._index_path).find("No Such Font", False, False)
+
+        index = FontIndex([self._fonts_dir], self._index_path)
+        index.rebuild = None  # must not be called
+        self.assertEqual(self._font_path, index.find(self._families[0], self._bold, self._italic))
+
+    def test_rebuilds_on_directory_change(self):
+        FontIndex([self._fonts_dir], self._index_path).find("No Such Font", False, False)
+
+        subdir = os.path.join(self._fonts_dir, "new")
+        os.mkdir(subdir)
+        new_path = shutil.copy(self._font_path, os.path.join(subdir, "copy.ttf"))
+        os.remove(self._font_path)
+        os.utime(self._fonts_dir, (0, 0))
+
+        index = FontIndex([self._fonts_dir], self._index_path)
+        self.assertEqual(new_path, index.find(self._families[0], self._bold, self._italic))
+
+
+class TestFontCollections(unittest.TestCase):
+    def test_split_face_path(self):
+        self.assertEqual(("/fonts/a.ttc", 2), split_face_path("/fonts/a.ttc#2"))
+        self.assertEqual(("/fonts/a.ttf", 0), split_face_path("/fonts/a.ttf"))
+        self.assertEqual(("/fonts/#1/a.ttf", 0), split_face_path("/fonts/#1/a.ttf"))
+
+    def test_find_collection_face(self):
+        index = FontIndex([], None)
+        index._set_fonts([("/fonts/a.ttc#0", ["Song"], "Regular", False, False),
+                          ("/fonts/a.ttc#1", ["Song"], "Bold", True, False)])
+        self.assertEqual("/fonts/a.ttc#1", index.find("Song", True, False))
+        self.assertEqual("/fonts/a.ttc#0", index.find("So", False, False))
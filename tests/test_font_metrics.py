@@ -0,0 +1,33 @@
+import os
+import unittest
+from array import array
+
+from md2gost.renderable.font_metrics import FontMetrics
+from md2gost.renderable.glyph_table import DENSE_CODEPOINTS
+
+from . import _use_temporary_cache_dir
+
+
+class TestFontMetrics(unittest.TestCase):
+    def setUp(self):
+        self._font_path = os.path.join(_use_temporary_cache_dir(self), "font.ttf")
+        with open(self._font_path, "wb") as f:
+            f.write(b"font")
+
+    def test_round_trip(self):
+        dense = tuple(array("i", range(k, k + DENSE_CODEPOINTS)) for k in range(4))
+        FontMetrics(self._font_path, 14).save({"height": 16}, (dense, {0x4E00: (1, 2, 3, 4)}, {5: -1}))
+
+        metrics = FontMetrics(self._font_path, 14)
+        self.assertEqual({"height": 16}, metrics.values)
+        loaded_dense, sparse, kerning = metrics.glyphs
+        self.assertEqual([list(values) for values in dense], [list(values) for values in loaded_dense])
+        self.assertEqual({0x4E00: (1, 2, 3, 4)}, sparse)
+        self.assertEqual({5: -1}, kerning)
+
+    def test_other_size_and_changed_font(self):
+        FontMetrics(self._font_path, 14).save({"height": 16}, None)
+
+        self.assertEqual({}, FontMetrics(self._font_path, 12).values)
+        os.utime(self._font_path, ns=(0, 0))
+        self.assertEqual({}, FontMetrics(self._font_path, 14).values)
@@ -0,0 +1,51 @@
+import unittest
+from unittest import mock
+
+from freetype import Face
+from PIL import Image, ImageDraw, ImageFont
+
+from md2gost.renderable.find_font import find_font
+from md2gost.renderable.glyph_table import GlyphTable, needs_shaping
+from md2gost.renderable.paragraph_sizer import Font
+
+TEXTS = ["AVATAR", "Ty. Wo. LT", "fig. 1/2; 0123456789", "Съешь же ещё этих мягких французских булок",
+         "«ГОСТ 7.32—2017»", "ТУЛЬСКИЙ УГОЛЬ", "Г.Т.Д."]
+
+
+class TestGlyphTable(unittest.TestCase):
+    def setUp(self):
+        path = find_font("Times New Roman", False, False)
+        face = Face(path)
+        face.set_char_size(14 * 64)
+        self._table = GlyphTable.from_face(face)
+        self._font = ImageFont.truetype(path, 14, layout_engine=ImageFont.Layout.BASIC)
+        self._draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+
+    def test_kerned(self):
+        # the comparison with PIL covers the kerning only if the texts are kerned
+        indices = [self._table.glyph(ord(char))[0] for char in "AVATAR"]
+        self.assertNotEqual(0, sum(self._table.kerning(left, right) for left, right in zip(indices, indices[1:])))
+
+    def test_same_as_pil(self):
+        for text in TEXTS:
+            with self.subTest(text):
+                bbox = self._draw.textbbox((0, 0), text, self._font)
+                self.assertEqual(bbox[2] - bbox[0], self._table.text_width(text))
+
+    def test_shaping(self):
+        for text in ["سلام", "é", "नमस्ते", "a‍b"]:
+            with self.subTest(text):
+                self.assertTrue(any(needs_shaping(char) for char in text))
+                self.assertIsNone(self._table.text_width(text))
+
+
+class TestFontShaping(unittest.TestCase):
+    def test_pil_fallback(self):
+        font = Font("Times New Roman", False, False, 14)
+        if font.glyph_table is None:
+            self.skipTest("PIL measures this font itself")
+        with mock.patch.object(Font, "_get_pil_text_width", return_value=20) as get_pil_text_width:
+            font.get_text_width("Привет")
+            get_pil_text_width.assert_not_called()
+            font.get_text_width("سلام")
+            get_pil_text_width.assert_called_once_with("سلام")
@@ -0,0 +1,86 @@
+import os
+import unittest
+from unittest import mock
+
+from lxml import etree
+
+from md2gost.latex_math import latex_to_omml, formula_cache, convert_formulas, inline_latex_to_omml, \
+    _convert, _translate, _convert_mathml, _Unsupported, _SYMBOLS, _FUNCTIONS
+
+from . import _use_temporary_cache_dir
+
+
+class TestLatexToOmml(unittest.TestCase):
+    def setUp(self):
+        _use_temporary_cache_dir(self)
+        formula_cache.clear()
+
+    def test_cached_copies(self):
+        first = latex_to_omml(r"\frac{a}{b}")
+        second = latex_to_omml(r"\frac{a}{b}")
+
+        self.assertIsNot(first, second)
+        self.assertEqual(etree.tostring(first), etree.tostring(second))
+        self.assertEqual((1, 1), (formula_cache.hits, formula_cache.misses))
+
+    def test_disk_cache(self):
+        omml = etree.tostring(latex_to_omml(r"\sqrt{x}"))
+        formula_cache.clear()
+
+        with mock.patch("md2gost.latex_math._convert") as convert:
+            self.assertEqual(omml, etree.tostring(latex_to_omml(r"\sqrt{x}")))
+            convert.assert_not_called()
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            latex_to_omml(r"\sqrt")
+        self.assertNotIn(r"\sqrt", formula_cache)
+
+    def test_convert_formulas(self):
+        convert_formulas([r"\frac{a}{b}", r"\sqrt{x}", r"\frac{a}{b}", r"\sqrt"], 2)
+        self.assertNotIn(r"\sqrt", formula_cache)
+
+        with mock.patch("md2gost.latex_math._convert") as convert:
+            latex_to_omml(r"\frac{a}{b}")
+            latex_to_omml(r"\sqrt{x}")
+            convert.assert_not_called()
+
+    def test_convert_formulas_no_cache(self):
+        with mock.patch.dict(os.environ, {"MD2GOST_NO_CACHE": "1"}), \
+                mock.patch("md2gost.latex_math.ProcessPoolExecutor") as executor:
+            convert_formulas([r"\frac{a}{b}", r"\sqrt{x}"], 2)
+        executor.assert_not_called()
+        self.assertNotIn(r"\frac{a}{b}", formula_cache)
+
+    def test_inline(self):
+        omml = inline_latex_to_omml(r"\frac{a+b}{c_1} + x")
+
+        self.assertEqual([], omml.xpath("//m:f", namespaces=omml.nsmap))
+        self.assertEqual("(a+b)/c1+x", "".join(omml.itertext()))
+        self.assertIsNot(omml, inline_latex_to_omml(r"\frac{a+b}{c_1} + x"))
+
+
+class TestTranslate(unittest.TestCase):
+    def test_same_as_mathml(self):
+        formulas = [
+            r"a+b-c = 3.14", r"f(x) = [a, b]; |x|! * y", r"x^2_1", r"x_{i,j}^{12}", r"x^12", r"(a+b)^2",
+            r"{a+b}^2", r"\frac{a+b}{c_1} + x", r"\frac12", r"x^\frac12", r"\sqrt x", r"\sqrt[n]{\frac{a}{b}}",
+            r"\sum_{i=1}^{n} x_i", r"\sum_{i=1}^{n}{x_i^2}", r"\sum^n x", r"\sum x", r"\prod_{k=1}^{N} k",
+            r"\int_0^{\infty} e^{-\lambda t} dt", r"\sin^2 x + \cos^2 x = 1", r"\log_2 n",
+            r"\sigma^2 = \frac{1}{N}\sum_{i=1}^{N}(x_i - \mu)^2",
+            r"10^{-3}", r"1.5\cdot 10^3", r"\frac123", r"\sqrt 12", r"x_10", r"\sin \cos x", r"\log \log n",
+            *(f"\\{name}" for name in _SYMBOLS), *(f"\\{name} x" for name in _FUNCTIONS),
+        ]
+        for formula in formulas:
+            with self.subTest(formula):
+                self.assertEqual(etree.tostring(_convert_mathml(formula)), etree.tostring(_translate(formula)))
+
+    def test_unsupported(self):
+        for formula in [r"\lim_{x \to 0} f", r"a/b", r"f'", r"a{b}c", r"x^2^3", r"\sqrt", r"\left(x\right)",
+                        r"x^1.5", r"2cm"]:
+            with self.subTest(formula), self.assertRaises(_Unsupported):
+                _translate(formula)
+
+    def test_fallback(self):
+        self.assertEqual(etree.tostring(_convert_mathml(r"\lim_{x \to 0} f")),
+                         etree.tostring(_convert(r"\lim_{x \to 0} f")))
@@ -0,0 +1,37 @@
+import unittest
+from unittest import mock
+
+from md2gost.renderable.listing import Listing, highlight_listings
+
+from . import _create_test_document, _use_temporary_cache_dir
+
+
+class TestListing(unittest.TestCase):
+    def setUp(self):
+        self._document, _, _ = _create_test_document()
+        _use_temporary_cache_dir(self, SYNTAX_HIGHLIGHTING="1")
+
+    def _set_text(self, text: str) -> Listing:
+        listing = Listing(self._document._body, "python", None)
+        listing.set_text(text)
+        return listing
+
+    def test_highlighting_cache(self):
+        text = "def f():\n    return 'строка'\n\nprint(f())\n"
+        listing = self._set_text(text)
+        self.assertEqual(["def f():", "    return 'строка'", "", "print(f())"],
+                         [paragraph._docx_paragraph.text for paragraph in listing.paragraphs])
+
+        with mock.patch("md2gost.renderable.highlighting.highlight") as highlight:
+            cached_listing = self._set_text(text)
+            highlight.assert_not_called()
+        self.assertEqual(listing.fingerprint(), cached_listing.fingerprint())
+
+    def test_highlight_listings(self):
+        texts = ["print(1)", "print(2)"]
+        highlight_listings([(text, "python") for text in texts] + [("x", "неизвестный")], 2)
+
+        with mock.patch("md2gost.renderable.highlighting.highlight") as highlight:
+            listings = [self._set_text(text) for text in texts]
+            highlight.assert_not_called()
+        self.assertEqual(texts, [listing.paragraphs[0]._docx_paragraph.text for listing in listings])
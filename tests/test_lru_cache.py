@@ -0,0 +1,49 @@
+import unittest
+
+from md2gost.lru_cache import LRUCache, cache_stats
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache("test", 2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+
+    def test_get_or_create(self):
+        cache = LRUCache("test", 2)
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return "value"
+
+        self.assertEqual("value", cache.get_or_create("key", factory))
+        self.assertEqual("value", cache.get_or_create("key", factory))
+        self.assertEqual(1, len(calls))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_shrink(self):
+        cache = LRUCache("test", 3)
+        for i in range(3):
+            cache.put(i, i)
+        cache.maxsize = 1
+
+        self.assertEqual(1, len(cache))
+        self.assertIn(2, cache)
+
+    def test_cache_stats(self):
+        cache = LRUCache("test_cache_stats", 4)
+        cache.get("missing")
+        cache.put("key", 1)
+        cache.get("key")
+
+        stats = {s.name: s for s in cache_stats()}["test_cache_stats"]
+        self.assertEqual(1, stats.hits)
+        self.assertEqual(1, stats.misses)
+        self.assertEqual(0.5, stats.hit_rate)
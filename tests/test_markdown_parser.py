@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+
+import docx
+
+from md2gost.parser.markdown_parser import split_chunks, MarkdownParser
+
+
+class TestSplitChunks(unittest.TestCase):
+    def test_blocks(self):
+        text = "# Заголовок\n\nАбзац\nпродолжение\n\nАбзац 2\n"
+        self.assertEqual(["# Заголовок\n\n", "Абзац\nпродолжение\n\n", "Абзац 2\n"], split_chunks(text))
+
+    def test_not_split(self):
+        texts = [
+            "1. один\n\n2. два\n",
+            "```\nкод\n\n# комментарий\n```\n",
+            "$$\na\n\nb\n$$\n",
+            "<!-- комментарий\n\nтекст -->\n",
+            "    код\n\n    код\n",
+            "[ссылка]\n\n[ссылка]: https://example.com\n",
+        ]
+        for text in texts:
+            self.assertEqual([text], split_chunks(text))
+
+    def test_after_fence(self):
+        self.assertEqual(["```\nкод\n```\n\n", "Абзац\n"], split_chunks("```\nкод\n```\n\nАбзац\n"))
+
+
+class TestListings(unittest.TestCase):
+    def test_listings(self):
+        with tempfile.TemporaryDirectory() as dir_path:
+            with open(os.path.join(dir_path, "code.py"), "w", encoding="utf-8") as f:
+                f.write("print(2)\n")
+            text = "```python\nprint(1)\n```\n\n```\nбез языка\n```\n\n```python code.py\n```\n"
+            self.assertEqual([("print(1)", "python"), ("print(2)", "python")],
+                             MarkdownParser(docx.Document()).listings(text, dir_path))
+
+
+class TestFormulas(unittest.TestCase):
+    def test_formulas(self):
+        text = "$$\nx^2\n$$\n\nТекст $y$\n\n- пункт *$z$*\n\n$$ \\frac{a}{b} $$\n"
+        self.assertEqual(["x^2", "y", "z", "\\frac{a}{b}"], MarkdownParser(docx.Document()).formulas(text))
@@ -3,12 +3,13 @@ import unittest
 from md2gost.layout_tracker import LayoutTracker
 from md2gost.renderable.paragraph import Paragraph
 
-from . import _create_test_document, _EMUS_PER_PX
+from . import _create_test_document, _use_temporary_cache_dir, _EMUS_PER_PX
 
 
 class TestParagraph(unittest.TestCase):
     def setUp(self) -> None:
         self._document, self._max_height, self._max_width = _create_test_document()
+        _use_temporary_cache_dir(self)
 
     def test_render(self):
         paragraph = Paragraph(self._document._body)
@@ -19,3 +20,11 @@ class TestParagraph(unittest.TestCase):
 
         self.assertAlmostEqual(45.5, info.height / _EMUS_PER_PX, delta=1/3)
 
+    def test_inline_equation(self):
+        paragraph = Paragraph(self._document._body)
+        paragraph.add_inline_equation("x^2")
+        paragraph.add_inline_equation(r"\sqrt")
+
+        p = paragraph._docx_paragraph._p
+        self.assertEqual(1, len(p.xpath("m:oMath")))
+        self.assertEqual(r"\sqrt", paragraph._docx_paragraph.text)
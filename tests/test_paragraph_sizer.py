@@ -1,9 +1,11 @@
 import unittest
+from unittest import mock
 
-from md2gost.renderable.paragraph_sizer import Font, ParagraphSizer
+from md2gost.renderable.paragraph_sizer import Font, ParagraphSizer, measurement_cache
 from md2gost.renderable.listing import LISTING_OFFSET
+from md2gost.latex_math import inline_latex_to_omml
 
-from . import _create_test_document, _EMUS_PER_PX
+from . import _create_test_document, _use_temporary_cache_dir, _EMUS_PER_PX
 
 delta = 10 / 29
 
@@ -42,6 +44,12 @@ class TestFont(unittest.case.TestCase):
                                font.get_text_width("hello") / _EMUS_PER_PX,
                                delta=delta)
 
+    def test_get_text_width_memoized(self):
+        font = Font("Times New Roman", False, False, 14)
+        width = font.get_text_width("слово")
+        self.assertEqual(width, font.get_text_width("слово"))
+        self.assertEqual((1, 1), (font._word_widths.hits, font._word_widths.misses))
+
     def test_get_line_height_times(self):
         font = Font("Times New Roman", False, False, 14)
         self.assertAlmostEqual(21.4, font.get_line_height() / _EMUS_PER_PX,
@@ -408,3 +416,126 @@ class TestParagraphSizer(unittest.TestCase):
         ps = ParagraphSizer(paragraph, None, self._max_width - LISTING_OFFSET)
 
         self.assertEqual(expected, ps.split_lines())
+
+    def test_count_lines_listing_tabs(self):
+        # tabs move to the default tab stops, so the word doesn't fit the first line
+        paragraph = self._document.add_paragraph(style="Code")
+        paragraph.add_run("\t" * 13 + "console")
+        ps = ParagraphSizer(paragraph, None, self._max_width - LISTING_OFFSET)
+
+        self.assertEqual(["", "console"], ps.split_lines())
+
+
+class TestMeasurementKey(unittest.case.TestCase):
+    def setUp(self):
+        self._document, _, self._max_width = _create_test_document()
+        _use_temporary_cache_dir(self)
+
+    def _key(self, paragraph, previous=None):
+        return ParagraphSizer(paragraph, previous, self._max_width)._measurement_key()
+
+    def test_same_content(self):
+        first = self._document.add_paragraph("hello world")
+        second = self._document.add_paragraph("hello world")
+        second.paragraph_format.page_break_before = True
+        self.assertEqual(self._key(first), self._key(second))
+
+    def test_different_content(self):
+        first = self._document.add_paragraph("hello world")
+        second = self._document.add_paragraph("hello")
+        second.add_run(" world").bold = True
+        third = self._document.add_paragraph("hello world", style="Code")
+        self.assertEqual(3, len({self._key(first), self._key(second), self._key(third)}))
+
+    def test_inline_formulas(self):
+        paragraphs = []
+        for formula in ("x^2", "y^2"):
+            paragraphs.append(self._document.add_paragraph("hello "))
+            paragraphs[-1]._p.append(inline_latex_to_omml(formula))
+        self.assertNotEqual(self._key(paragraphs[0]), self._key(paragraphs[1]))
+
+    def test_previous_paragraph(self):
+        previous = self._document.add_paragraph("hello", style="Code")
+        paragraph = self._document.add_paragraph("hello world")
+        self.assertNotEqual(self._key(paragraph), self._key(paragraph, previous))
+
+    def test_different_documents(self):
+        other_document, _, _ = _create_test_document()
+        self.assertNotEqual(self._key(self._document.add_paragraph("hello world")),
+                            self._key(other_document.add_paragraph("hello world")))
+
+
+class TestMeasureMany(unittest.case.TestCase):
+    def setUp(self):
+        self._document, _, self._max_width = _create_test_document()
+
+    def test_same_as_calculate_height(self):
+        texts = ["", "short", "Съешь же ещё этих мягких французских булок, да выпей чаю. " * 5,
+                 "verylongword" * 20, "a\tb"]
+        paragraphs = []
+        for style in ("Normal", "Code"):
+            for text in texts:
+                paragraphs.append(self._document.add_paragraph(style=style))
+                paragraphs[-1].add_run(text[:10]).bold = True
+                paragraphs[-1].add_run(text[10:])
+        previous_paragraphs = [None] + paragraphs[:-1]
+
+        results = ParagraphSizer.measure_many(paragraphs, self._max_width, previous_paragraphs)
+
+        measurement_cache.clear()
+        for paragraph, previous_paragraph, result in zip(paragraphs, previous_paragraphs, results):
+            self.assertEqual(ParagraphSizer(paragraph, previous_paragraph, self._max_width).calculate_height(),
+                             result)
+
+
+def _split_overlong_unit_linearly(self, pos, unit, lines, char_width=None):
+    """The character by character split that _split_overlong_unit replaced,
+    every part is measured by the fonts of its runs"""
+    first_line_width = self.max_width - ((self.paragraph_format.first_line_indent or 0) + self._tabs_size)
+    i = 0
+    for j in range(len(unit)+1):
+        part_width = self._width_model.word_width(pos+i, pos+j)
+        if not self.font.is_mono:
+            part_width *= 1.001
+        if part_width > (self.max_width if len(lines) != 0 else first_line_width):
+            lines.append(unit[i:j-1])
+            i = j-1
+    return i
+
+
+class TestSplitOverlongUnits(unittest.case.TestCase):
+    def setUp(self):
+        self._document, _, self._max_width = _create_test_document()
+
+    def _assert_same_as_linear_split(self, paragraph):
+        lines = ParagraphSizer(paragraph, None, self._max_width).split_lines()
+        self.assertGreater(len(lines), 1)
+        with mock.patch.object(ParagraphSizer, "_split_overlong_unit", _split_overlong_unit_linearly):
+            self.assertEqual(ParagraphSizer(paragraph, None, self._max_width).split_lines(), lines)
+
+    def test_url(self):
+        paragraph = self._document.add_paragraph()
+        paragraph.add_run("См. https://example.com/" + "/".join(f"раздел{i}?query=value&page={i}" for i in range(12)))
+        self._assert_same_as_linear_split(paragraph)
+
+    def test_several_runs(self):
+        paragraph = self._document.add_paragraph("Слово ")
+        for i in range(30):
+            run = paragraph.add_run(f"Электроэнцефалография{i}")
+            run.bold = i % 2 == 0
+            run.italic = i % 3 == 0
+        self._assert_same_as_linear_split(paragraph)
+
+    def test_listing(self):
+        paragraph = self._document.add_paragraph(style="Code")
+        paragraph.add_run("x" * 200)
+        paragraph.add_run("y" * 100).bold = True
+        self._assert_same_as_linear_split(paragraph)
+
+    def test_listing_tabs(self):
+        # the trailing tabs of a unit split by characters move to the tab stops, as in the other units
+        paragraph = self._document.add_paragraph(style="Code")
+        paragraph.add_run("b" * 199 + "\t" * 3 + "c")
+        ps = ParagraphSizer(paragraph, None, self._max_width - LISTING_OFFSET)
+
+        self.assertEqual(["b" * 68, "b" * 68, "b" * 63, "\t\tc"], ps.split_lines())
@@ -0,0 +1,73 @@
+import unittest
+
+import docx
+from docx.opc.constants import RELATIONSHIP_TYPE
+from docx.oxml.ns import qn
+
+from md2gost.docx_elements import create_field
+from md2gost.parallel import split_chapters, has_toc, export_body, ChapterMerger, RenderedChapter, HeadingItem
+from md2gost.processors.toc.toc_processor import heading_anchor
+from md2gost.util import create_element
+
+from . import _use_temporary_cache_dir
+
+
+class TestSplitChapters(unittest.TestCase):
+    def setUp(self):
+        _use_temporary_cache_dir(self)
+
+    def test_split(self):
+        sources = [("[TOC]\n\n# Глава 1\n\nТекст\n\n## Раздел\n\nТекст\n", "a.md"),
+                   ("Продолжение\n\n# Глава 2\n\n```\n# комментарий\n```\n", "b.md")]
+        self.assertEqual([
+            [("[TOC]\n\n", "a.md")],
+            [("# Глава 1\n\nТекст\n\n## Раздел\n\nТекст\n", "a.md"), ("Продолжение\n\n", "b.md")],
+            [("# Глава 2\n\n```\n# комментарий\n```\n", "b.md")],
+        ], split_chapters(sources))
+
+    def test_first_heading(self):
+        chapters = split_chapters([("# Глава 1\n\nТекст\n\n# Глава 2\n", "a.md")])
+        self.assertEqual([[("# Глава 1\n\nТекст\n\n", "a.md")], [("# Глава 2\n", "a.md")]], chapters)
+        self.assertFalse(has_toc(chapters[0]))
+
+
+class TestChapterMerger(unittest.TestCase):
+    def setUp(self):
+        _use_temporary_cache_dir(self)
+
+    def _chapter(self) -> RenderedChapter:
+        document = docx.Document()
+        document._body.clear_content()
+        anchor = heading_anchor(1, "Выводы", 1)
+        hyperlink = create_element("w:hyperlink", {
+            "r:id": document.part.relate_to("https://example.com", RELATIONSHIP_TYPE.HYPERLINK, is_external=True)
+        })
+        document._body._element.append(create_element("w:p", [
+            create_element("w:bookmarkStart", {"w:id": anchor, "w:name": anchor}),
+            create_element("w:bookmarkEnd", {"w:id": anchor}),
+            create_element("w:fldSimple", {"w:instr": "SEQ Рисунок \\* ARABIC"}, [create_element("w:r", "1")]),
+            create_field("1", "REF picture \\h"),
+            hyperlink,
+        ]))
+        body, relationships = export_body(document)
+        return RenderedChapter(body, relationships, [HeadingItem(1, "Выводы", True, anchor, 2)],
+                               {"Рисунок": 1}, {"picture": ("Рисунок", 1)}, 3)
+
+    def test_append(self):
+        document = docx.Document()
+        document._body.clear_content()
+        merger = ChapterMerger(document, {"Рисунок": 2}, {}, [(1, "Выводы")])
+        chapter = self._chapter()
+        headings = merger.add_headings(chapter)
+        merger.append(chapter)
+        merger.set_references()
+
+        anchor = heading_anchor(1, "Выводы", 2)
+        self.assertEqual(anchor, headings[0].anchor)
+        p = document._body._element.xpath("w:p")[-1]
+        self.assertEqual(anchor, p.xpath("w:bookmarkStart")[0].get(qn("w:name")))
+        self.assertEqual(anchor, p.xpath("w:bookmarkEnd")[0].get(qn("w:id")))
+        self.assertEqual("3", p.xpath("w:fldSimple/w:r")[0].text)
+        self.assertEqual("3", p.xpath("w:r/w:t")[0].text)
+        r_id = p.xpath("w:hyperlink")[0].get(qn("r:id"))
+        self.assertEqual("https://example.com", document.part.rels[r_id].target_ref)
@@ -0,0 +1,93 @@
+import os
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import docx
+
+from md2gost.remote_images import fetch_images, remote_image, image_cache
+from md2gost.renderable import Image
+
+from . import _use_temporary_cache_dir
+
+IMAGE_PATH = os.path.join(os.path.dirname(__file__), "..", "images", "crossreferencing.png")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    content = b""
+    etag = '"1"'
+    requests: list[tuple[str, str | None]] = []
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path != "/image.png":
+            self.send_error(404)
+        elif self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header("ETag", self.etag)
+            self.send_header("Content-Length", str(len(self.content)))
+            self.end_headers()
+            self.wfile.write(self.content)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestRemoteImages(unittest.TestCase):
+    def setUp(self):
+        _use_temporary_cache_dir(self)
+        image_cache.clear()
+        self.addCleanup(image_cache.clear)
+
+        with open(IMAGE_PATH, "rb") as f:
+            _Handler.content = f.read()
+        _Handler.etag = '"1"'
+        _Handler.requests = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self._server.serve_forever, args=(0.01,), daemon=True).start()
+        self.addCleanup(self._server.server_close)
+        self.addCleanup(self._server.shutdown)
+        self._url = f"http://127.0.0.1:{self._server.server_port}/image.png"
+
+    def test_prefetch(self):
+        fetch_images([self._url, self._url])
+        self.assertEqual([("/image.png", None)], _Handler.requests)
+
+        image = Image(docx.Document()._body, self._url)
+        self.assertEqual(1, len(_Handler.requests))
+        self.assertIsNotNone(image.fingerprint()[3])
+
+    def test_revalidation(self):
+        fetch_images([self._url])
+        image_cache.clear()
+
+        fetch_images([self._url])
+        self.assertEqual([("/image.png", None), ("/image.png", '"1"')], _Handler.requests)
+        self.assertEqual(_Handler.content, remote_image(self._url))
+
+        image_cache.clear()
+        _Handler.etag = '"2"'
+        _Handler.content = b"changed"
+        fetch_images([self._url])
+        self.assertEqual(b"changed", remote_image(self._url))
+
+    def test_saved_copy(self):
+        fetch_images([self._url])
+        image_cache.clear()
+        self._server.shutdown()
+        self._server.server_close()
+
+        with self.assertLogs(level="WARNING"):
+            fetch_images([self._url])
+        self.assertEqual(_Handler.content, remote_image(self._url))
+
+    def test_missing(self):
+        url = self._url.replace("image.png", "missing.png")
+        with self.assertLogs(level="WARNING"):
+            fetch_images([url])
+        self.assertIsNone(remote_image(url))
+        self.assertEqual([], list(Image(docx.Document()._body, url).render(None, None)))
+        self.assertEqual(1, len(_Handler.requests))
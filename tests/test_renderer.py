@@ -0,0 +1,119 @@
+import unittest
+
+from md2gost.layout_tracker import LayoutTracker
+from md2gost.processors.renderer import Renderer
+from md2gost.renderable.page_break import PageBreak
+from md2gost.renderable.paragraph import Paragraph
+
+from . import _create_test_document
+
+
+class _FailingParagraph(Paragraph):
+    def render(self, previous_rendered, layout_state):
+        yield from super().render(previous_rendered, layout_state)
+        raise RuntimeError("render failed")
+
+
+class TestRenderer(unittest.TestCase):
+    def setUp(self):
+        self._document, self._max_height, self._max_width = _create_test_document()
+        self._layout_tracker = LayoutTracker(self._max_height, self._max_width)
+        self._renderer = Renderer(self._document, self._layout_tracker)
+        self._texts = [f"Абзац {i}. " + "слово " * (20 + i % 7 * 10) for i in range(80)]
+
+    def _paragraphs(self, texts: list[str], document=None) -> list[Paragraph]:
+        document = document or self._document
+        paragraphs = []
+        for text in texts:
+            paragraphs.append(Paragraph(document._body))
+            paragraphs[-1].add_run(text)
+        return paragraphs
+
+    def _render_from_scratch(self, texts: list[str]):
+        document, max_height, max_width = _create_test_document()
+        layout_tracker = LayoutTracker(max_height, max_width)
+        Renderer(document, layout_tracker).process(self._paragraphs(texts, document))
+        return layout_tracker.current_state.page, layout_tracker.current_state.current_page_height
+
+    def _assert_same_as_from_scratch(self, texts: list[str]):
+        self.assertEqual(texts, [paragraph.text for paragraph in self._document.paragraphs])
+        self.assertEqual(self._render_from_scratch(texts),
+                         (self._layout_tracker.current_state.page,
+                          self._layout_tracker.current_state.current_page_height))
+
+    def test_changed_paragraph(self):
+        self._renderer.process(self._paragraphs(self._texts))
+        last_element = self._document.paragraphs[-1]._p
+
+        self._texts[10] = self._texts[10].replace("Абзац", "Пункт")
+        self._renderer.process(self._paragraphs(self._texts))
+
+        self._assert_same_as_from_scratch(self._texts)
+        # the height didn't change, so the layout converges and the output of the last paragraph is reused
+        self.assertIs(last_element, self._document.paragraphs[-1]._p)
+
+    def test_changed_height(self):
+        self._renderer.process(self._paragraphs(self._texts))
+
+        self._texts[10] += "ещё " * 100
+        self._renderer.process(self._paragraphs(self._texts))
+
+        self._assert_same_as_from_scratch(self._texts)
+
+    def test_removed_and_added_paragraphs(self):
+        self._renderer.process(self._paragraphs(self._texts))
+
+        del self._texts[5]
+        self._texts.insert(30, "Новый абзац")
+        self._renderer.process(self._paragraphs(self._texts))
+
+        self._assert_same_as_from_scratch(self._texts)
+
+    def test_reset_after_failure(self):
+        self._renderer.process(self._paragraphs(self._texts))
+        paragraphs = self._paragraphs(self._texts)
+        paragraphs[40] = _FailingParagraph(self._document._body)
+        paragraphs[40].add_run("Сбой")
+        with self.assertRaises(RuntimeError):
+            self._renderer.process(paragraphs)
+
+        self._renderer.reset()
+        self.assertEqual([], self._document.paragraphs)
+        self._renderer.process(self._paragraphs(self._texts))
+        self._assert_same_as_from_scratch(self._texts)
+
+    def test_page_number_field_added_once(self):
+        Renderer(self._document, self._layout_tracker)
+        footer = self._document.sections[-1].footer.paragraphs[0]
+        self.assertEqual(1, len(footer._p.xpath("w:fldSimple")))
+
+    def test_layout_only(self):
+        document, max_height, max_width = _create_test_document()
+        layout_tracker = LayoutTracker(max_height, max_width)
+        renderer = Renderer(document, layout_tracker, layout_only=True)
+        renderables = self._paragraphs(self._texts, document)
+        renderables.insert(40, PageBreak(document._body))
+        renderer.process(renderables)
+
+        self.assertEqual([], document.paragraphs)
+        layouts = renderer.block_layouts()
+        self.assertEqual(self._render_from_scratch(self._texts[:40])[0] + 1, layouts[41].start_page)
+        self.assertEqual(0, layouts[41].y_offset)
+        self.assertEqual(len(renderables), len(layouts))
+        for previous, layout in zip(layouts, layouts[1:]):
+            self.assertLessEqual(layout.start_page - previous.end_page, 1)
+        self.assertEqual(layout_tracker.current_state.page, layouts[-1].end_page)
+
+    def _layouts(self, texts: list[str]):
+        document, max_height, max_width = _create_test_document()
+        renderer = Renderer(document, LayoutTracker(max_height, max_width), layout_only=True)
+        renderer.process(self._paragraphs(texts, document))
+        return renderer.block_layouts()
+
+    def test_pushed_paragraph(self):
+        # one-line paragraphs fill the first page but a line, so the long paragraph goes to the next page
+        short_count = sum(layout.end_page == 1 for layout in self._layouts(["Строка"] * 100)) - 1
+        layouts = self._layouts(["Строка"] * short_count + [self._texts[0]])
+
+        self.assertEqual(1, layouts[-2].end_page)
+        self.assertEqual((2, 2, 0), (layouts[-1].start_page, layouts[-1].end_page, layouts[-1].y_offset))
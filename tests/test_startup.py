@@ -0,0 +1,27 @@
+import re
+import subprocess
+import sys
+import unittest
+
+# cumulative import time of the command line module, the conversion modules are imported on demand
+STARTUP_BUDGET_US = 150_000
+
+_HEAVY_MODULES = ("pygments", "requests", "latex2mathml", "matplotlib")
+
+
+def _run(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, check=True)
+
+
+class TestStartup(unittest.TestCase):
+    def test_cli_import_time(self):
+        stderr = _run("import md2gost.__main__").stderr
+        match = re.search(r"^import time:\s+\d+ \|\s+(\d+) \| md2gost\.__main__$", stderr, re.M)
+        self.assertIsNotNone(match)
+        self.assertLess(int(match.group(1)), STARTUP_BUDGET_US)
+
+    def test_heavy_modules_not_imported(self):
+        stdout = _run(f"import sys, md2gost.converter; "
+                      f"print(*(m for m in {_HEAVY_MODULES!r} if m in sys.modules))").stdout
+        self.assertEqual("", stdout.strip())
@@ -0,0 +1,38 @@
+import unittest
+
+from docx.enum.style import WD_STYLE_TYPE
+from docx.shared import Pt
+
+from md2gost.style_table import get_style_table
+from md2gost.util import create_element
+
+from . import _create_test_document
+
+
+class TestStyleTable(unittest.case.TestCase):
+    def setUp(self):
+        self._document, _, _ = _create_test_document()
+        self._document.styles.add_style("Child", WD_STYLE_TYPE.PARAGRAPH).base_style = self._document.styles["Code"]
+        self._document.styles["Child"].font.bold = True
+        self._table = get_style_table(self._document.part)
+
+    def test_base_styles(self):
+        paragraph = self._document.add_paragraph(style="Child")
+        self.assertEqual("Courier New", self._table.font(paragraph).name)
+        self.assertEqual(Pt(12), self._table.font(paragraph).size)
+        self.assertTrue(self._table.font(paragraph).bold)
+        self.assertEqual(1, self._table.paragraph_format(paragraph).line_spacing)
+
+    def test_direct_formatting(self):
+        paragraph = self._document.add_paragraph()
+        paragraph.paragraph_format.space_after = Pt(10)
+        self.assertEqual(Pt(10), self._table.paragraph_format(paragraph).space_after)
+        normal_format = self._document.styles["Normal"].paragraph_format
+        self.assertEqual(normal_format.first_line_indent, self._table.paragraph_format(paragraph).first_line_indent)
+        self.assertEqual(normal_format.space_after,
+                         self._table.paragraph_format(self._document.add_paragraph()).space_after)
+
+    def test_contextual_spacing(self):
+        self.assertFalse(self._table.is_contextual_spacing(self._document.add_paragraph()))
+        self._document.styles["Code"].element.get_or_add_pPr().append(create_element("w:contextualSpacing"))
+        self.assertTrue(self._table.is_contextual_spacing(self._document.add_paragraph(style="Child")))
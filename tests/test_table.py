@@ -0,0 +1,96 @@
+import unittest
+
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.shared import Pt
+from docx.table import Table as DocxTable
+
+from md2gost.layout_tracker import LayoutState
+from md2gost.renderable.caption import CaptionInfo
+from md2gost.renderable.paragraph import Paragraph
+from md2gost.renderable.paragraph_sizer import measurement_cache
+from md2gost.renderable.table import CellParagraph, Table, CELL_OFFSET
+
+from . import _create_test_document
+
+
+class TestCellParagraph(unittest.TestCase):
+    def _cell_paragraph(self) -> CellParagraph:
+        cell_paragraph = CellParagraph()
+        cell_paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+        cell_paragraph.add_run("Ячейка ", is_bold=True)
+        cell_paragraph.add_link_url("https://example.com").add_run("ссылка")
+        return cell_paragraph
+
+    def test_key(self):
+        self.assertEqual(self._cell_paragraph().key(), self._cell_paragraph().key())
+        other = self._cell_paragraph()
+        other.add_run("!")
+        self.assertNotEqual(self._cell_paragraph().key(), other.key())
+
+    def test_fill(self):
+        document, _, _ = _create_test_document()
+        paragraph = Paragraph(document._body)
+        cell_paragraph = CellParagraph()
+        cell_paragraph.add_run("Ячейка ", is_bold=True)
+        cell_paragraph.add_run("таблицы", is_italic=True)
+        cell_paragraph.fill(paragraph)
+
+        runs = paragraph._docx_paragraph.runs
+        self.assertEqual("Ячейка таблицы", paragraph._docx_paragraph.text)
+        self.assertEqual([True, None], [run.bold for run in runs])
+        self.assertEqual([None, True], [run.italic for run in runs])
+
+
+class TestTableRender(unittest.TestCase):
+    def setUp(self):
+        self._document, self._max_height, self._max_width = _create_test_document()
+        self._table = Table(self._document._body, 60, 3, CaptionInfo("table", "Таблица"))
+        self._table.set_number(1)
+        for i in range(60):
+            for j in range(3):
+                paragraph = self._table.add_paragraph_to_cell(i, j)
+                paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER if j == 0 else None
+                paragraph.add_run(f"Ячейка {i}.{j} ", is_bold=j == 0)
+                paragraph.add_run("слово " * (i * (j + 1) % 13 * 3))
+        measurement_cache.clear()
+        self.addCleanup(measurement_cache.clear)
+
+    def _row_heights_per_cell(self) -> list[int]:
+        """Returns the heights of the rows measuring each cell paragraph on its own"""
+        measurement_cache.clear()
+        cell_max_width = self._table._table_width / 3 - CELL_OFFSET
+        heights = []
+        for row in self._table._rows:
+            cell_heights = []
+            for cell in row:
+                cell_height = 0
+                for cell_paragraph in cell:
+                    paragraph = self._table._create_paragraph_template(cell_paragraph.alignment)
+                    cell_paragraph.fill(paragraph)
+                    layout_state = LayoutState(self._max_height, cell_max_width)
+                    cell_height += sum(info.height for info in paragraph.render(None, layout_state))
+                cell_heights.append(cell_height)
+            heights.append(max(cell_heights) + Pt(0.5))
+        return heights
+
+    def test_same_as_per_cell(self):
+        layout_state = LayoutState(self._max_height, self._max_width)
+        infos = list(self._table.render(None, layout_state))
+        row_heights = self._row_heights_per_cell()
+
+        replayed_state = LayoutState(self._max_height, self._max_width)
+        rows = 0
+        tables = [info for info in infos if isinstance(info.docx_element, DocxTable)]
+        self.assertGreater(len(tables), 1)
+        for info in infos:
+            replayed_state.add_height(info.height)
+            if isinstance(info.docx_element, DocxTable):
+                table_rows = len(info.docx_element.rows)
+                border = Pt(1.5) if info is tables[0] else 0
+                self.assertEqual(border + sum(row_heights[rows:rows + table_rows]), info.height)
+                rows += table_rows
+                if info is not tables[-1]:
+                    # the table is continued on the next page only if its next row doesn't fit
+                    self.assertGreater(row_heights[rows], replayed_state.remaining_page_height)
+        self.assertEqual(60, rows)
+        self.assertEqual(replayed_state.page, layout_state.page)
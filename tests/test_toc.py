@@ -0,0 +1,26 @@
+import unittest
+
+from md2gost.processors.toc.toc_processor import TocPreProcessor, heading_anchor
+from md2gost.renderable.heading import Heading
+from md2gost.renderable.toc import ToC
+
+from . import _create_test_document, _use_temporary_cache_dir
+
+
+class TestTocPreProcessor(unittest.TestCase):
+    def setUp(self):
+        self._document, _, _ = _create_test_document()
+        _use_temporary_cache_dir(self)
+
+    def test_inline_formula(self):
+        heading = Heading(self._document._body, 1, True)
+        heading.add_run("Сложность ")
+        heading.add_inline_equation("O(n)")
+        heading.add_run(" алгоритма")
+        toc = ToC(self._document._body)
+        TocPreProcessor().process([toc, heading])
+
+        self.assertEqual("Сложность O(n) алгоритма", heading.text)
+        self.assertEqual(heading_anchor(1, "Сложность O(n) алгоритма", 1), heading.anchor)
+        item = toc._paragraphs[0]._docx_paragraph._p
+        self.assertEqual("1. Сложность O(n) алгоритма", "".join(item.xpath(".//w:t/text()")))
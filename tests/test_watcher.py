@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+from md2gost.watcher import Watcher
+
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self._input_path = os.path.join(directory.name, "input.md")
+        self._image_path = os.path.join(directory.name, "image.png")
+        for path in (self._input_path, self._image_path):
+            with open(path, "w") as f:
+                f.write("")
+        self._watcher = Watcher([self._input_path], [self._image_path])
+
+    def _touch(self, path: str, time_ns: int):
+        os.utime(path, ns=(time_ns, time_ns))
+
+    def test_changed(self):
+        self.assertFalse(self._watcher.changed())
+        self._touch(self._image_path, 10**9)
+        self.assertTrue(self._watcher.changed())
+        self.assertFalse(self._watcher.changed())
+
+    def test_missing_input(self):
+        os.remove(self._input_path)
+        self.assertFalse(self._watcher.changed())
+        with open(self._input_path, "w") as f:
+            f.write("# Новый текст")
+        self._touch(self._input_path, 10**9)
+        self.assertTrue(self._watcher.changed())
+
+    def test_set_dependencies(self):
+        self._touch(self._image_path, 10**9)
+        self._watcher.set_dependencies([self._image_path])
+        # the change made before set_dependencies is still noticed
+        self.assertTrue(self._watcher.changed())